@@ -0,0 +1,94 @@
+import os, json, math, random, hashlib
+from dedup import PromptFilter
+from sinks import create_sinks
+from storage import write_json_atomic
+from table import TableRenderer
+
+
+CHUNK_SIZE = 10000
+
+
+def parse_range(text):
+    start, _, end = text.partition(":")
+    return int(start or 0), (int(end) if end else None)
+
+
+class BatchJob:
+    # Output i is template i % T of row i // T; a seed only changes the order, never the outputs themselves.
+    def __init__(self, fields, rows, seed=None, row_headers=True, transforms=None):
+        self.renderer = TableRenderer(fields)
+        # Rows are transformed up front, once per keyword, and the signature covers the transformed values.
+        self.rows = [transforms.apply(row) for row in rows] if transforms is not None and transforms.rules else rows
+        self.row_headers = row_headers
+        self.seed = seed
+        self.template_count = len(self.renderer.templates)
+        self.total = len(rows) * self.template_count
+        self.multiplier, self.offset = 1, 0
+        if seed is not None and self.total > 1:
+            rng = random.Random(seed)
+            while True:
+                self.multiplier = rng.randrange(1, self.total)
+                if math.gcd(self.multiplier, self.total) == 1:
+                    break
+            self.offset = rng.randrange(self.total)
+
+        signature = hashlib.blake2b(json.dumps([fields, seed, row_headers]).encode("utf-8"), digest_size=16)
+        for row in self.rows:
+            signature.update(json.dumps(row).encode("utf-8"))
+        self.signature = signature.hexdigest()
+        self.dropped = 0
+
+    def index_at(self, position):
+        return (self.multiplier * position + self.offset) % self.total
+
+    def render_index(self, index):
+        row_index, template_index = divmod(index, self.template_count)
+        row = self.rows[row_index]
+        header, fmt = self.renderer.formats_for(len(row))[template_index]
+        if self.row_headers:
+            header = f"{header} #{row_index + 1}"
+        return header, fmt(*row)
+
+    def iter_range(self, start, end, shadow=None):
+        for position in range(start, end):
+            index = self.index_at(position)
+            output = self.render_index(index)
+            if shadow is not None:
+                row_index, template_index = divmod(index, self.template_count)
+                shadow.observe_output(self.rows[row_index], template_index, self.template_count, output,
+                                      row_index + 1 if self.row_headers else None)
+            yield output
+
+    def run(self, output_dir, kinds, start=0, end=None, name="prompts", chunk_size=CHUNK_SIZE, on_chunk=None,
+            dedup=None, shadow=None):
+        end = self.total if end is None else min(end, self.total)
+        signature = self.signature if dedup is None else f"{self.signature}-{dedup}"
+        cursor_path = os.path.join(output_dir, f"{name}.{start}-{end}.cursor")
+        position = start
+        if os.path.exists(cursor_path):
+            with open(cursor_path, "r", encoding="utf-8") as f:
+                cursor = json.load(f)
+            if cursor.get("signature") != signature:
+                raise ValueError(f"{cursor_path} belongs to a different layout, table, seed or dedup setting")
+            position = cursor["next"]
+        elif not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+
+        while position < end:
+            # Chunks start at multiples of chunk_size, so ranges split on those multiples write identical files.
+            chunk_end = min(end, (position // chunk_size + 1) * chunk_size)
+            outputs = self.iter_range(position, chunk_end, shadow)
+            # Duplicates are dropped within a chunk, so resumed and split runs still write identical files.
+            prompt_filter = PromptFilter(dedup) if dedup is not None else None
+            if prompt_filter is not None:
+                outputs = prompt_filter.filter(outputs)
+            with create_sinks(output_dir, kinds, name=f"{name}-{position:010d}") as pipeline:
+                for header, text in outputs:
+                    pipeline.write(header, text)
+            if prompt_filter is not None:
+                self.dropped += prompt_filter.dropped()
+            position = chunk_end
+            write_json_atomic(cursor_path, {"signature": signature, "start": start, "end": end, "next": position})
+            if on_chunk is not None:
+                on_chunk(position, end)
+        return position
@@ -0,0 +1,214 @@
+import os, sys, time, argparse, shutil, tempfile, tracemalloc
+
+
+# Headless benchmarks for the paths that got slow with large inputs. Run one benchmark per process,
+# memory numbers are RssAnon deltas and include whatever Qt and Python keep cached afterwards.
+def rss_anon_mb():
+    with open("/proc/self/status", "r") as f:
+        for line in f:
+            if line.startswith("RssAnon:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def keyword_text(size_mb):
+    lines = []
+    size = 0
+    index = 0
+    while size < size_mb * 1024 * 1024:
+        line = ", ".join(f"keyword{i}" for i in range(index, index + 7))
+        lines.append(line)
+        size += len(line) + 1
+        index += 7
+    return "\n".join(lines)
+
+
+def bench_paste(app, window, size_mb):
+    from replay import settle
+    part2 = window.part2_container
+    text = keyword_text(size_mb)
+    app.clipboard().setText(text)
+    settle(app, window)
+    memory = rss_anon_mb()
+    started = time.perf_counter()
+    window.part1_container.text_edit.paste()
+    settle(app, window)
+    paste_time = time.perf_counter() - started
+    paste_memory = rss_anon_mb() - memory
+    part2.auto_mode.setCurrentText("Delimiter")
+    part2.auto_pattern.setText(",")
+    memory = rss_anon_mb()
+    started = time.perf_counter()
+    part2.on_auto_clicked()
+    settle(app, window)
+    print(f"paste {size_mb} MB: {paste_time:.2f}s to idle, +{paste_memory:.0f} MB; "
+          f"auto-mark {len(part2.marked_spots)} marks: {time.perf_counter() - started:.2f}s, "
+          f"+{rss_anon_mb() - memory:.0f} MB")
+
+
+def bench_resize(app, window, fields, frames, steps):
+    # A live drag delivers a few resize events per frame; a frame is done once the coalesced layout
+    # passes have run and the window has repainted. The frame timer is flushed by hand, so the numbers
+    # are the work done per frame, not the timer's wait.
+    import ui
+    from replay import settle, percentile
+    window.apply_layout([(f"Field {index}", f"a{index % 3 + 1} photo") for index in range(fields)])
+    settle(app, window)
+    times = []
+    for frame in range(frames):
+        started = time.perf_counter()
+        for step in range(steps):
+            grow = frame * steps + step
+            window.resize(1200 + grow * 2, 700 + grow)
+        app.processEvents()
+        if ui.frame_coalescer.timer.isActive():
+            ui.frame_coalescer.timer.stop()
+            ui.frame_coalescer.flush()
+        app.processEvents()
+        times.append((time.perf_counter() - started) * 1000)
+    times.sort()
+    print(f"resize {fields} fields, {frames} frames of {steps} resize events: p50 {percentile(times, 0.5):.1f} ms, "
+          f"p90 {percentile(times, 0.9):.1f} ms, max {times[-1]:.1f} ms (budget 16.7 ms)")
+
+
+def bench_lifecycle(app, window, cycles, max_growth_mb):
+    # Run, open and close the output and history windows over and over; live QObjects have to stay flat
+    # and memory may only grow by what the run history itself keeps. Returns False on a leak.
+    from PyQt5.QtCore import QObject, QEvent
+    from replay import settle
+    part2 = window.part2_container
+    window.part1_container.text_edit.setPlainText("red car, blue sky, green tree")
+    part2.auto_mode.setCurrentText("Delimiter")
+    part2.auto_pattern.setText(",")
+    part2.on_auto_clicked()
+    part2.on_eval_clicked()
+    window.apply_layout([("A", "a1 photo"), ("B", "a2, a3"), ("C", "a3 at night")])
+    settle(app, window)
+
+    def cycle():
+        window.on_run_button_clicked()
+        output_window = window.output_window
+        output_window.view.copy_content(output_window.model.index(0, 0))
+        window.close_output_window()
+        window.show_output_window()
+        window.close_output_window()
+        window.show_history_window()
+        window.close_history_window()
+        settle(app, window)
+        app.sendPostedEvents(None, QEvent.DeferredDelete)
+
+    def live_objects():
+        return len(app.findChildren(QObject)) + len(window.findChildren(QObject)) + len(app.allWidgets())
+
+    for _ in range(20):
+        cycle()
+    objects, memory = live_objects(), rss_anon_mb()
+    started = time.perf_counter()
+    for _ in range(cycles):
+        cycle()
+    growth = rss_anon_mb() - memory
+    print(f"lifecycle {cycles} cycles in {time.perf_counter() - started:.1f}s: live QObjects {objects} -> "
+          f"{live_objects()}, RssAnon +{growth:.1f} MB (limit {max_growth_mb} MB)")
+    return live_objects() <= objects and growth <= max_growth_mb
+
+
+def traced(build):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return kept, size
+
+
+def bench_memory(count):
+    # Python heap kept per mark and per output, with fresh strings for every item as marking and rendering
+    # produce them. The paged store keeps its records on disk, which is reported separately.
+    from marks import MarkList
+    from outputs import PagedOutputStore
+    words = [f"keyword{index}" for index in range(2000)]
+
+    def mark_dicts():
+        return [{"start": index * 10, "length": 8, "text": words[index % 2000][:4] + words[index % 2000][4:]}
+                for index in range(count)]
+
+    def mark_list():
+        marks = MarkList()
+        marks.extend((index * 10, index * 10 + 8, words[index % 2000][:4] + words[index % 2000][4:])
+                     for index in range(count))
+        return marks
+
+    def output_tuples():
+        return [(f"Header {index % 50}", f"photo of {words[index % 2000]}, {index} " * 4) for index in range(count)]
+
+    folder = tempfile.mkdtemp(prefix="rapidprompt-bench-")
+
+    def output_store():
+        store = PagedOutputStore(os.path.join(folder, "outputs"))
+        for index in range(count):
+            store.append(f"Header {index % 50}", f"photo of {words[index % 2000]}, {index} " * 4)
+        store.sync()
+        return store
+
+    try:
+        for name, build in (("marks as dicts", mark_dicts), ("marks in MarkList", mark_list),
+                            ("outputs as tuples", output_tuples), ("outputs in PagedOutputStore", output_store)):
+            kept, size = traced(build)
+            line = f"{name:<28}{size / count:>8.1f} bytes per item"
+            if isinstance(kept, PagedOutputStore):
+                line += f", {(kept.size + kept.count * 8) / count:.1f} bytes per item on disk"
+                kept.close()
+            print(line)
+            del kept
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog="bench")
+    commands = parser.add_subparsers(dest="command", required=True)
+    paste = commands.add_parser("paste", help="paste a keyword dump into Part1 and wait until the UI is idle")
+    paste.add_argument("--size", type=int, default=1, help="size of the pasted text in MB")
+    resize = commands.add_parser("resize", help="time the frames of a window resize drag")
+    resize.add_argument("--fields", type=int, default=500, help="number of Part3 fields")
+    resize.add_argument("--frames", type=int, default=60)
+    resize.add_argument("--steps", type=int, default=4, help="resize events per frame")
+    lifecycle = commands.add_parser("lifecycle", help="check run/show/close cycles for leaked QObjects and memory")
+    lifecycle.add_argument("--cycles", type=int, default=1000)
+    lifecycle.add_argument("--max-growth", type=float, default=16,
+                           help="allowed RssAnon growth in MB, the run history database keeps a page cache")
+    memory = commands.add_parser("memory", help="tracemalloc heap per mark and per output")
+    memory.add_argument("--count", type=int, default=100000)
+    args = parser.parse_args(argv)
+    if args.command == "memory":
+        bench_memory(args.count)
+        return 0
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from storage import DATA_DIR_ENV
+    temp_dir = tempfile.mkdtemp(prefix="rapidprompt-bench-")
+    os.environ[DATA_DIR_ENV] = temp_dir
+    from PyQt5.QtWidgets import QApplication
+    from replay import settle
+    from ui import MainWindow
+    app = QApplication.instance() or QApplication([])
+    window = MainWindow()
+    window.resize(1600, 900)
+    window.show()
+    settle(app, window)
+    passed = True
+    try:
+        if args.command == "paste":
+            bench_paste(app, window, args.size)
+        elif args.command == "resize":
+            bench_resize(app, window, args.fields, args.frames, args.steps)
+        elif args.command == "lifecycle":
+            passed = bench_lifecycle(app, window, args.cycles, args.max_growth)
+    finally:
+        window.close()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,90 @@
+import json, hashlib
+from itertools import compress
+from storage import write_atomic
+
+
+NEW, CHANGED, UNCHANGED = 0, 1, 2
+DIGEST_SIZE = 8
+CHANGED_MASK = bytes.maketrans(bytes((NEW, CHANGED, UNCHANGED)), b"\x01\x01\x00")
+FINGERPRINT_FILE = "fingerprint.json"
+
+
+def output_digest(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=DIGEST_SIZE).digest()
+
+
+class ChangeTracker:
+    # An output is matched by its header and how often that header came before it in the run.
+    # The fingerprint keeps one bytes object of concatenated digests per header, about 8 bytes per output.
+    def __init__(self, previous=None):
+        self.previous = previous or {}
+        self.current = {}
+        self.states = bytearray()
+        self.counts = [0, 0, 0]
+        self.removed_outputs = None
+
+    def add(self, header, text):
+        digest = output_digest(text)
+        seen = self.current.get(header)
+        if seen is None:
+            seen = self.current[header] = bytearray()
+        offset = len(seen)
+        seen += digest
+        old = self.previous.get(header)
+        if old is None or len(old) <= offset:
+            state = NEW
+        elif old[offset:offset + DIGEST_SIZE] == digest:
+            state = UNCHANGED
+        else:
+            state = CHANGED
+        self.states.append(state)
+        self.counts[state] += 1
+        return state
+
+    def finish(self):
+        # The previous digests are only compared against while outputs are added, so a finished run drops
+        # them and keeps what was removed.
+        self.removed_outputs = self.removed()
+        self.previous = {}
+
+    def removed(self):
+        if self.removed_outputs is not None:
+            return self.removed_outputs
+        removed = []
+        for header, old in self.previous.items():
+            count = (len(old) - len(self.current.get(header, b""))) // DIGEST_SIZE
+            if count > 0:
+                removed.append((header, count))
+        return removed
+
+    def fingerprint(self):
+        # Shares the digests instead of copying them, nothing is added to a tracker once its run is done.
+        return dict(self.current)
+
+    def summary(self):
+        removed = sum(count for _, count in self.removed())
+        new, changed, unchanged = self.counts
+        return f"{new} new, {changed} changed, {unchanged} unchanged, {removed} removed"
+
+
+def changed_only(outputs, states):
+    return compress(outputs, states.translate(CHANGED_MASK))
+
+
+def changed_rows(states, rows=None):
+    if rows is None:
+        return list(compress(range(len(states)), states.translate(CHANGED_MASK)))
+    return [row for row in rows if states[row] != UNCHANGED]
+
+
+def read_fingerprint(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    return {header: bytes.fromhex(digests) for header, digests in data.items()}
+
+
+def write_fingerprint(path, fingerprint):
+    write_atomic(path, json.dumps({header: digests.hex() for header, digests in fingerprint.items()}))
@@ -0,0 +1,140 @@
+import re, hashlib
+from array import array
+from collections import deque
+from itertools import chain
+
+
+WORD_PATTERN = re.compile(r"\w+")
+NUM_BINS = 32
+SKETCH_SIZE = 32
+BUCKET_SIZE = 4
+MAX_CHECKS = 4
+# (bands, rows) splits of the 32 bins; a pair becomes a candidate at about (1 / bands) ** (1 / rows) similarity.
+BAND_SPLITS = ((32, 1), (16, 2), (8, 4), (4, 8), (2, 16))
+WINDOW = 100000
+SIMILARITY_LEVELS = (("Exact", 1.0), ("90% similar", 0.9), ("80% similar", 0.8), ("70% similar", 0.7))
+SHINGLE_CACHE_SIZE = 100000
+
+
+def band_split(threshold):
+    # The strictest split that still catches pairs at the threshold, so fewer lookalikes need a full check.
+    best = BAND_SPLITS[0]
+    for bands, rows in BAND_SPLITS:
+        if (1 / bands) ** (1 / rows) <= threshold:
+            best = (bands, rows)
+    return best
+
+
+def shingles(text):
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < 2:
+        return set(words)
+    return set(zip(words, words[1:]))
+
+
+def similarity(first, second):
+    # Bottom-k estimate of the Jaccard similarity, exact while both prompts have at most SKETCH_SIZE shingles.
+    second = frozenset(memoryview(second).cast("Q"))
+    union = first | second
+    if not union:
+        return 1.0
+    if len(union) > SKETCH_SIZE:
+        union = frozenset(sorted(union)[:SKETCH_SIZE])
+        return len(first & second & union) / SKETCH_SIZE
+    return len(first & second) / len(union)
+
+
+class PromptFilter:
+    # Drops prompts seen among the last `window` kept ones: exact copies by hash, lookalikes by MinHash/LSH.
+    def __init__(self, threshold=1.0, window=WINDOW):
+        self.threshold = threshold
+        self.window = window
+        self.near = threshold < 1.0
+        bands, rows = band_split(threshold)
+        self.band_slices = [slice(band * rows, (band + 1) * rows) for band in range(bands)]
+        self.rows = rows
+        self.exact = set()
+        self.buckets = [{} for _ in range(bands)]
+        self.sketches = {}
+        self.kept = deque()
+        self.shingle_hashes = {}
+        self.next_id = 0
+        self.dropped_exact = 0
+        self.dropped_near = 0
+
+    def shingle_hash(self, shingle):
+        if len(self.shingle_hashes) >= SHINGLE_CACHE_SIZE:
+            self.shingle_hashes.clear()
+        key = " ".join(shingle) if shingle.__class__ is tuple else shingle
+        value = int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+        self.shingle_hashes[shingle] = value
+        return value
+
+    def signature(self, hashes):
+        # One permutation MinHash: the low bits of a hash pick its bin and each bin keeps its smallest hash.
+        # `hashes` is sorted descending, so dict() keeps the smallest per bin without a Python-level loop.
+        bins = dict(zip(map((NUM_BINS - 1).__and__, hashes), hashes))
+        return tuple(map(bins.get, range(NUM_BINS)))
+
+    def keep(self, text):
+        digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+        if digest in self.exact:
+            self.dropped_exact += 1
+            return False
+        keys = ()
+        if self.near:
+            cache = self.shingle_hashes
+            hashes = sorted({cache.get(shingle) or self.shingle_hash(shingle) for shingle in shingles(text)},
+                            reverse=True)
+            sketch = hashes[-SKETCH_SIZE:]
+            sketch_set = frozenset(sketch)
+            signature = self.signature(hashes)
+            rows = self.rows
+            keys = [signature[band] for band in self.band_slices]
+            # LSH only picks the candidates, the bottom-k sketches decide, so banding noise cannot drop a prompt.
+            # Only a few candidates are checked, those from rarely shared bands first: bands made of template
+            # boilerplate match every prompt of that template and say little.
+            matches = sorted((bucket[key] for bucket, key in zip(self.buckets, keys)
+                              if key in bucket and key.count(None) < rows), key=len)
+            for other in list(dict.fromkeys(chain.from_iterable(matches)))[:MAX_CHECKS]:
+                if similarity(sketch_set, self.sketches[other]) >= self.threshold:
+                    self.dropped_near += 1
+                    return False
+            # Kept prompts are stored as flat bytes and tuples, which stay compact and out of the garbage collector.
+            self.sketches[self.next_id] = array("Q", sketch).tobytes()
+            for bucket, key in zip(self.buckets, keys):
+                # Buckets only remember their latest prompts, so a lookup costs a bounded number of checks.
+                bucket[key] = bucket.get(key, ())[1 - BUCKET_SIZE:] + (self.next_id,)
+        self.exact.add(digest)
+        self.kept.append((self.next_id, digest, keys))
+        self.next_id += 1
+        if len(self.kept) > self.window:
+            self.forget()
+        return True
+
+    def forget(self):
+        prompt_id, digest, keys = self.kept.popleft()
+        self.exact.discard(digest)
+        if self.near:
+            del self.sketches[prompt_id]
+            for bucket, key in zip(self.buckets, keys):
+                ids = bucket.get(key)
+                if ids is not None and prompt_id in ids:
+                    ids = tuple(other for other in ids if other != prompt_id)
+                    if ids:
+                        bucket[key] = ids
+                    else:
+                        del bucket[key]
+
+    def dropped(self):
+        return self.dropped_exact + self.dropped_near
+
+    def filter(self, outputs):
+        for header, text in outputs:
+            if self.keep(text):
+                yield header, text
+
+    def summary(self):
+        if self.near:
+            return f"{self.dropped()} duplicate(s) dropped, {self.dropped_exact} exact and {self.dropped_near} similar"
+        return f"{self.dropped_exact} duplicate(s) dropped"
@@ -0,0 +1,152 @@
+import os, json, time, sqlite3, hashlib
+from itertools import islice
+
+
+RECORD_BATCH = 4096
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    duration REAL NOT NULL,
+    layout_hash BLOB NOT NULL,
+    keywords TEXT NOT NULL,
+    output_count INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_started ON runs(started);
+CREATE TABLE IF NOT EXISTS run_keywords (
+    keyword TEXT NOT NULL,
+    run_id INTEGER NOT NULL,
+    PRIMARY KEY (keyword, run_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS prompts (
+    hash BLOB PRIMARY KEY,
+    body TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS outputs (
+    run_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    header TEXT NOT NULL,
+    prompt_hash BLOB NOT NULL,
+    PRIMARY KEY (run_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS outputs_header ON outputs(header, run_id);
+DROP TABLE IF EXISTS fingerprints;
+CREATE TABLE IF NOT EXISTS workspace_fingerprints (
+    workspace TEXT NOT NULL,
+    header TEXT NOT NULL,
+    headers_hash BLOB NOT NULL,
+    digests BLOB NOT NULL,
+    PRIMARY KEY (workspace, header)
+) WITHOUT ROWID;
+"""
+
+
+def content_hash(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def headers_hash(fields):
+    # Template edits keep the headers, another layout opened under the same workspace name does not.
+    return content_hash(json.dumps(sorted({header for header, content in fields if content.strip()})))
+
+
+class RunHistory:
+    def __init__(self, path):
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        # Instances share one history, so wait on each other's write transactions instead of failing.
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.executescript(SCHEMA)
+
+    def record_run(self, fields, keywords, outputs, started, duration):
+        layout_hash = content_hash(json.dumps(fields))
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO runs (started, duration, layout_hash, keywords, output_count) VALUES (?, ?, ?, ?, ?)",
+                (started, duration, layout_hash, json.dumps(keywords), len(outputs))
+            )
+            run_id = cursor.lastrowid
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO run_keywords (keyword, run_id) VALUES (?, ?)",
+                ((keyword, run_id) for keyword in keywords)
+            )
+            # Outputs are hashed and inserted a batch at a time, so a big run is never held as one list.
+            rows = enumerate(outputs)
+            while True:
+                batch = [(position, header, text, content_hash(text))
+                         for position, (header, text) in islice(rows, RECORD_BATCH)]
+                if not batch:
+                    break
+                self.connection.executemany(
+                    "INSERT OR IGNORE INTO prompts (hash, body) VALUES (?, ?)",
+                    ((prompt_hash, text) for _, _, text, prompt_hash in batch)
+                )
+                self.connection.executemany(
+                    "INSERT INTO outputs (run_id, position, header, prompt_hash) VALUES (?, ?, ?, ?)",
+                    ((run_id, position, header, prompt_hash) for position, header, _, prompt_hash in batch)
+                )
+        return run_id
+
+    def find_runs(self, header=None, keyword=None, since=None, until=None, limit=200):
+        query = "SELECT id, started, duration, output_count, keywords FROM runs WHERE 1"
+        params = []
+        if header is not None:
+            query += " AND id IN (SELECT run_id FROM outputs WHERE header = ?)"
+            params.append(header)
+        if keyword is not None:
+            query += " AND id IN (SELECT run_id FROM run_keywords WHERE keyword = ?)"
+            params.append(keyword)
+        if since is not None:
+            query += " AND started >= ?"
+            params.append(since)
+        if until is not None:
+            query += " AND started < ?"
+            params.append(until)
+        query += " ORDER BY started DESC LIMIT ?"
+        params.append(limit)
+        return [
+            (run_id, started, duration, output_count, json.loads(keywords))
+            for run_id, started, duration, output_count, keywords in self.connection.execute(query, params)
+        ]
+
+    def search_runs(self, text, limit=200):
+        text = text.strip()
+        if not text:
+            return self.find_runs(limit=limit)
+        try:
+            day = time.mktime(time.strptime(text, "%Y-%m-%d"))
+        except ValueError:
+            pass
+        else:
+            return self.find_runs(since=day, until=day + 86400, limit=limit)
+        by_header = self.find_runs(header=text, limit=limit)
+        by_keyword = self.find_runs(keyword=text, limit=limit)
+        runs = {run[0]: run for run in by_header + by_keyword}
+        return sorted(runs.values(), key=lambda run: run[1], reverse=True)[:limit]
+
+    def run_outputs(self, run_id):
+        return self.connection.execute(
+            "SELECT outputs.header, prompts.body FROM outputs JOIN prompts ON prompts.hash = outputs.prompt_hash "
+            "WHERE outputs.run_id = ? ORDER BY outputs.position",
+            (run_id,)
+        ).fetchall()
+
+    def read_fingerprint(self, workspace, fields):
+        # The digests of a workspace's last Run, so changes are still told apart after a restart. They only
+        # count if that Run had the same headers; otherwise every output is new.
+        return {header: bytes(digests) for header, digests in self.connection.execute(
+            "SELECT header, digests FROM workspace_fingerprints WHERE workspace = ? AND headers_hash = ?",
+            (workspace, headers_hash(fields)))}
+
+    def write_fingerprint(self, workspace, fields, fingerprint):
+        fields_hash = headers_hash(fields)
+        with self.connection:
+            self.connection.execute("DELETE FROM workspace_fingerprints WHERE workspace = ?", (workspace,))
+            self.connection.executemany(
+                "INSERT INTO workspace_fingerprints (workspace, header, headers_hash, digests) VALUES (?, ?, ?, ?)",
+                ((workspace, header, fields_hash, digests) for header, digests in fingerprint.items())
+            )
+
+    def close(self):
+        self.connection.close()
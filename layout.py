@@ -0,0 +1,19 @@
+import os, json
+from storage import write_json_atomic
+
+
+def read_layout(path):
+    with open(path, "r") as f:
+        layout_data = json.load(f)
+    return [(data.get("header", ""), data.get("content", "")) for data in layout_data]
+
+
+def write_layout(path, fields):
+    write_json_atomic(path, [{"header": header, "content": content} for header, content in fields])
+
+
+def read_keywords(path):
+    with open(path, "r", encoding="utf-8") as f:
+        if os.path.splitext(path)[1].lower() == ".json":
+            return [spot["text"] for spot in json.load(f).get("Marks", [])]
+        return [line.strip() for line in f if line.strip() != ""]
@@ -0,0 +1,131 @@
+import re, sys
+from array import array
+from bisect import bisect_left, bisect_right
+
+
+def split_spans(text, mode, pattern=""):
+    if mode == "Lines":
+        separator = re.compile(r"\n")
+    elif mode == "Delimiter":
+        separator = re.compile("|".join([re.escape(pattern), r"\n"]) if pattern else r"\n")
+    else:
+        separator = re.compile(pattern)
+
+    spans = []
+    pos = 0
+    for match in separator.finditer(text):
+        if match.end() == match.start():
+            continue
+        spans.append((pos, match.start()))
+        pos = match.end()
+    spans.append((pos, len(text)))
+
+    stripped = []
+    for start, end in spans:
+        token = text[start:end]
+        if token.strip() == "":
+            continue
+        start += len(token) - len(token.lstrip())
+        end -= len(token) - len(token.rstrip())
+        stripped.append((start, end))
+    return stripped
+
+
+def utf16_positions(text, offsets):
+    # QTextDocument positions count UTF-16 code units, Python offsets count code points.
+    if all(ord(char) < 0x10000 for char in text):
+        return list(offsets)
+    positions = []
+    extra = 0
+    index = 0
+    for offset in offsets:
+        while index < offset:
+            if ord(text[index]) >= 0x10000:
+                extra += 1
+            index += 1
+        positions.append(offset + extra)
+    return positions
+
+
+class MarkList:
+    # Marks are kept sorted by start in flat arrays; they never overlap, so the ends are sorted too.
+    __slots__ = ("starts", "ends", "texts")
+
+    def __init__(self):
+        self.starts = array("q")
+        self.ends = array("q")
+        self.texts = []
+
+    @classmethod
+    def from_dicts(cls, spots):
+        marks = cls()
+        marks.extend((spot["start"], spot["start"] + spot["length"], spot["text"]) for spot in spots)
+        return marks
+
+    def to_dicts(self):
+        return [
+            {"start": start, "length": end - start, "text": text}
+            for start, end, text in zip(self.starts, self.ends, self.texts)
+        ]
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __iter__(self):
+        return zip(self.starts, self.ends, self.texts)
+
+    def first_after(self, position):
+        return bisect_right(self.ends, position)
+
+    def overlaps(self, start, end):
+        index = bisect_right(self.ends, start)
+        return index < len(self.starts) and self.starts[index] < end
+
+    def add(self, start, end, text):
+        if end <= start or self.overlaps(start, end):
+            return False
+        index = bisect_left(self.starts, start)
+        self.starts.insert(index, start)
+        self.ends.insert(index, end)
+        self.texts.insert(index, sys.intern(text))
+        return True
+
+    def extend(self, marks):
+        added = sorted(
+            (start, end, sys.intern(text)) for start, end, text in marks
+            if end > start and not self.overlaps(start, end)
+        )
+        kept = []
+        for mark in added:
+            if not kept or mark[0] >= kept[-1][1]:
+                kept.append(mark)
+        if kept and self.ends and kept[0][0] < self.ends[-1]:
+            self.rebuild(sorted(kept + list(zip(self.starts, self.ends, self.texts))))
+        else:
+            for start, end, text in kept:
+                self.starts.append(start)
+                self.ends.append(end)
+                self.texts.append(text)
+        # The added marks end up on the undo stack, so they are handed back as a MarkList, not as tuples.
+        added = MarkList()
+        added.rebuild(kept)
+        return added
+
+    def discard(self, marks):
+        starts = {start for start, _, _ in marks}
+        if starts:
+            self.rebuild([mark for mark in zip(self.starts, self.ends, self.texts) if mark[0] not in starts])
+
+    def rebuild(self, marks):
+        self.starts = array("q", [start for start, _, _ in marks])
+        self.ends = array("q", [end for _, end, _ in marks])
+        self.texts = [text for _, _, text in marks]
+
+    def remove_overlapping(self, start, end):
+        first = bisect_right(self.ends, start)
+        last = bisect_left(self.starts, end, first)
+        removed = list(zip(self.starts[first:last], self.ends[first:last], self.texts[first:last]))
+        del self.starts[first:last]
+        del self.ends[first:last]
+        del self.texts[first:last]
+        return removed
@@ -0,0 +1,122 @@
+import os, mmap, shutil, struct
+from array import array
+from collections import OrderedDict
+
+
+PAGE_SIZE = 256
+CACHE_PAGES = 64
+RECORD_HEADER = struct.Struct("<I")
+
+
+class PagedOutputStore:
+    # Outputs are appended to a data file and their offsets to an index file, both read back through mmap.
+    # Records are decoded a page at a time and only the most recently used pages stay in memory.
+    def __init__(self, folder, page_size=PAGE_SIZE, cache_pages=CACHE_PAGES):
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        self.folder = folder
+        self.page_size = page_size
+        self.cache_pages = cache_pages
+        self.data_file = open(os.path.join(folder, "outputs.bin"), "w+b")
+        self.index_file = open(os.path.join(folder, "outputs.idx"), "w+b")
+        self.count = 0
+        self.size = 0
+        self.pending = array("Q")
+        self.buffer = bytearray()
+        self.data_map = None
+        self.index_map = None
+        self.offsets = None
+        self.mapped_count = 0
+        self.pages = OrderedDict()
+
+    def append(self, header, text):
+        # Records are collected per page and written with its offsets in one go.
+        header = header.encode("utf-8")
+        if self.pages:
+            self.pages.pop(self.count // self.page_size, None)
+        buffer = self.buffer
+        self.pending.append(self.size + len(buffer))
+        buffer += RECORD_HEADER.pack(len(header))
+        buffer += header
+        buffer += text.encode("utf-8")
+        self.count += 1
+        if len(self.pending) >= self.page_size:
+            self.flush()
+
+    def flush(self):
+        self.data_file.write(self.buffer)
+        self.size += len(self.buffer)
+        self.buffer = bytearray()
+        self.pending.tofile(self.index_file)
+        self.pending = array("Q")
+
+    def sync(self):
+        # Maps whatever was appended since the last read.
+        if self.mapped_count == self.count:
+            return
+        self.flush()
+        self.data_file.flush()
+        self.index_file.flush()
+        self.unmap()
+        self.data_map = mmap.mmap(self.data_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.index_map = mmap.mmap(self.index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.offsets = memoryview(self.index_map).cast("Q")
+        self.mapped_count = self.count
+
+    def unmap(self):
+        if self.offsets is not None:
+            self.offsets.release()
+            self.offsets = None
+        for mapped in (self.data_map, self.index_map):
+            if mapped is not None:
+                mapped.close()
+        self.data_map = self.index_map = None
+
+    def read_page(self, page):
+        start = page * self.page_size
+        end = min(start + self.page_size, self.count)
+        offsets = self.offsets[start:end].tolist()
+        offsets.append(self.offsets[end] if end < self.count else self.size)
+        data = self.data_map
+        records = []
+        for record_start, record_end in zip(offsets, offsets[1:]):
+            text_start = record_start + RECORD_HEADER.size + RECORD_HEADER.unpack_from(data, record_start)[0]
+            records.append((data[record_start + RECORD_HEADER.size:text_start].decode("utf-8"),
+                            data[text_start:record_end].decode("utf-8")))
+        return records
+
+    def page(self, page):
+        records = self.pages.get(page)
+        if records is not None:
+            self.pages.move_to_end(page)
+            return records
+        self.sync()
+        records = self.read_page(page)
+        self.pages[page] = records
+        if len(self.pages) > self.cache_pages:
+            self.pages.popitem(last=False)
+        return records
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("output index out of range")
+        return self.page(index // self.page_size)[index % self.page_size]
+
+    def __iter__(self):
+        # A full pass, e.g. an export, streams the pages and leaves the cache of the view alone.
+        self.sync()
+        for page in range((self.count + self.page_size - 1) // self.page_size):
+            records = self.pages.get(page)
+            yield from records if records is not None else self.read_page(page)
+
+    def close(self):
+        self.unmap()
+        self.pages.clear()
+        self.data_file.close()
+        self.index_file.close()
+        shutil.rmtree(self.folder, ignore_errors=True)
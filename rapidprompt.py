@@ -1,13 +1,201 @@
-import sys
-from PyQt5.QtWidgets import QApplication
-from ui import MainWindow
+import os, re, sys
+import argparse
+from transforms import SlotTransforms
+from sinks import parse_sink_kinds
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="rapidprompt")
+    parser.add_argument("--watch", action="store_true", help="re-render outputs headless whenever the files change")
+    parser.add_argument("--render", action="store_true", help="render the layout once headless and write it to the sinks")
+    parser.add_argument("--layout", help="layout JSON exported from RapidPrompt")
+    parser.add_argument("--keywords", help="keyword file, one keyword per line or a session JSON")
+    parser.add_argument("--table", help="CSV/TSV file for --render, column k of every row fills slot k")
+    parser.add_argument("--table-header", action="store_true", help="skip the first table row as a header row")
+    parser.add_argument("--out", default="outputs", help="folder the rendered outputs are written to")
+    parser.add_argument("--data-dir", help="folder for sessions, history and saves (default: current folder)")
+    parser.add_argument("--sinks", default="jsonl", help="comma separated output formats: txt, jsonl, csv, batch")
+    parser.add_argument("--chunk-size", type=int, help="render in resumable chunks of this many outputs")
+    parser.add_argument("--seed", type=int, help="render the outputs in a shuffled order fixed by this seed")
+    parser.add_argument("--range", help="only render output positions START:END, e.g. to split a job across machines")
+    parser.add_argument("--transforms", default="", help="keyword transforms per slot, e.g. \"*: strip; 2: weight=1.2\"")
+    parser.add_argument("--dedup", nargs="?", const=1.0, type=float, metavar="SIMILARITY",
+                        help="drop repeated prompts, with e.g. 0.8 also prompts at least 80%% similar to a kept one")
+    parser.add_argument("--shadow", nargs="?", const=0.01, type=float, metavar="RATE",
+                        help="re-render this share of the outputs (default 0.01) with the reference renderer and "
+                             "report mismatches")
+    parser.add_argument("--changed-only", action="store_true",
+                        help="only write outputs that are new or changed since the last --render into --out")
+    parser.add_argument("--record", help="write the actions of this GUI session to a trace file")
+    parser.add_argument("--replay", help="replay a trace file headless and print per-action latencies")
+    parser.add_argument("--repeat", type=int, default=1, help="how often --replay runs the trace")
+    args, _ = parser.parse_known_args(argv)
+    if args.watch and not (args.layout and args.keywords):
+        parser.error("--watch needs --layout and --keywords")
+    if args.render and not (args.layout and (args.keywords or args.table)):
+        parser.error("--render needs --layout and --keywords or --table")
+    if args.chunk_size is not None and args.chunk_size < 1:
+        parser.error("--chunk-size must be at least 1")
+    if args.range and not re.fullmatch(r"\d*:\d*", args.range):
+        parser.error("--range must look like START:END")
+    if args.dedup is not None and not 0 < args.dedup <= 1:
+        parser.error("--dedup must be between 0 and 1")
+    if args.shadow is not None and not 0 < args.shadow <= 1:
+        parser.error("--shadow must be between 0 and 1")
+    if args.changed_only and (args.chunk_size or args.seed is not None or args.range):
+        parser.error("--changed-only cannot be combined with --chunk-size, --seed or --range")
+    try:
+        args.sinks = parse_sink_kinds(args.sinks)
+    except ValueError as e:
+        parser.error("--sinks: " + str(e))
+    try:
+        SlotTransforms(args.transforms)
+    except ValueError as e:
+        parser.error("--transforms: " + str(e))
+    return args
+
+
+def run_watch(args):
+    from watch import WatchSession, poll_watch
+    session = WatchSession(args.layout, args.keywords, args.out, SlotTransforms(args.transforms))
+    print(f"Watching {args.layout} and {args.keywords}, writing to {args.out} (Ctrl+C to stop)")
+    try:
+        poll_watch(session,
+                   lambda rendered: print(f"Re-rendered {len(rendered)} output(s)."),
+                   lambda e: print(f"Could not refresh outputs: {e}"))
+    except KeyboardInterrupt:
+        pass
+
+
+def run_render(args):
+    from layout import read_layout, read_keywords
+    from render import iter_render_fields
+    from dedup import PromptFilter
+    from changes import ChangeTracker, FINGERPRINT_FILE, UNCHANGED, read_fingerprint, write_fingerprint
+    from sinks import create_sinks
+    from snippets import expand_fields
+    from table import TableRenderer, read_table
+    from shadow import ShadowCheck
+    layout = read_layout(args.layout)
+    fields = expand_fields(layout)
+    transforms = SlotTransforms(args.transforms)
+    if args.chunk_size or args.seed is not None or args.range:
+        run_batch(args, layout, fields, transforms)
+        return
+    shadow = ShadowCheck(layout, transforms, args.shadow) if args.shadow is not None else None
+    if args.table:
+        outputs = TableRenderer(fields, transforms, shadow).iter_render(read_table(args.table, args.table_header))
+    else:
+        keywords = read_keywords(args.keywords)
+        outputs = iter_render_fields(fields, transforms.apply(keywords))
+        if shadow is not None:
+            outputs = shadow.observe_stream(keywords, outputs)
+    prompt_filter = None
+    if args.dedup is not None:
+        prompt_filter = PromptFilter(args.dedup)
+        outputs = prompt_filter.filter(outputs)
+    # Every --render leaves a fingerprint in --out, so the next one can tell what changed.
+    fingerprint_path = os.path.join(args.out, FINGERPRINT_FILE)
+    changes = ChangeTracker(read_fingerprint(fingerprint_path))
+    count = 0
+    with create_sinks(args.out, args.sinks) as pipeline:
+        for header, text in outputs:
+            if changes.add(header, text) == UNCHANGED and args.changed_only:
+                continue
+            pipeline.write(header, text)
+            count += 1
+    write_fingerprint(fingerprint_path, changes.fingerprint())
+    print(f"Rendered {count} output(s) to {args.out}")
+    print(f"Compared to the previous render: {changes.summary()}")
+    if prompt_filter is not None:
+        print(prompt_filter.summary())
+    if shadow is not None:
+        report_shadow(shadow)
+
+
+def report_shadow(shadow):
+    import json
+    while not shadow.check():
+        pass
+    for mismatch in shadow.reports:
+        print("Shadow mismatch: " + json.dumps(mismatch))
+    print(shadow.summary())
+
+
+def run_batch(args, layout, fields, transforms):
+    from batch import BatchJob, CHUNK_SIZE, parse_range
+    from layout import read_keywords
+    from table import read_table
+    from shadow import ShadowCheck
+    # Batch rows are transformed before rendering, so the shadow check compares them untransformed.
+    shadow = ShadowCheck(layout, None, args.shadow) if args.shadow is not None else None
+    if args.table:
+        job = BatchJob(fields, list(read_table(args.table, args.table_header)), args.seed, transforms=transforms)
+    else:
+        job = BatchJob(fields, [read_keywords(args.keywords)], args.seed, row_headers=False, transforms=transforms)
+    start, end = parse_range(args.range) if args.range else (0, None)
+    end = job.total if end is None else min(end, job.total)
+    try:
+        job.run(args.out, args.sinks, start, end, chunk_size=args.chunk_size or CHUNK_SIZE, dedup=args.dedup,
+                shadow=shadow, on_chunk=lambda position, end: print(f"Rendered {position - start} / {end - start} output(s)"))
+    except ValueError as e:
+        print(f"Could not render: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("Stopped, run the same command again to resume.")
+        sys.exit(1)
+    print(f"Rendered positions {start}:{end} of {job.total} to {args.out}")
+    if args.dedup is not None:
+        print(f"Dropped {job.dropped} duplicate(s) in this session")
+    if shadow is not None:
+        report_shadow(shadow)
+
+
+def run_replay(args):
+    import shutil, tempfile
+    from storage import DATA_DIR_ENV
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    # Replayed runs must not end up in the real run history.
+    temp_dir = None
+    if not args.data_dir:
+        temp_dir = tempfile.mkdtemp(prefix="rapidprompt-replay-")
+        os.environ[DATA_DIR_ENV] = temp_dir
+    from replay import replay, format_report
+    try:
+        print(format_report(replay(args.replay, args.repeat)))
+    finally:
+        if temp_dir is not None:
+            shutil.rmtree(temp_dir, ignore_errors=True)
 
 
 def main():
+    args = parse_args(sys.argv[1:])
+    if args.data_dir:
+        from storage import DATA_DIR_ENV
+        os.environ[DATA_DIR_ENV] = args.data_dir
+    if args.replay:
+        run_replay(args)
+        return
+    if args.watch:
+        run_watch(args)
+        return
+    if args.render:
+        run_render(args)
+        return
+
+    from PyQt5.QtWidgets import QApplication
+    from ui import MainWindow
     app = QApplication(sys.argv)
     window = MainWindow()
+    recorder = None
+    if args.record:
+        from replay import Recorder
+        recorder = Recorder(window, args.record)
     window.show()
-    sys.exit(app.exec_())
+    code = app.exec_()
+    if recorder is not None:
+        recorder.close()
+    sys.exit(code)
 
 if __name__ == '__main__':
     main()
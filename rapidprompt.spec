@@ -1,11 +1,12 @@
 # -*- mode: python ; coding: utf-8 -*-
+import os
 
 
 a = Analysis(
     ['rapidprompt.py'],
     pathex=[],
     binaries=[],
-    datas=[],
+    datas=[(vocab, '.') for vocab in ['bpe_simple_vocab_16e6.txt.gz'] if os.path.exists(vocab)],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
@@ -0,0 +1,81 @@
+import re
+from functools import lru_cache
+
+
+PLACEHOLDER_PATTERN = re.compile(r"[a-z](\d+)")
+
+
+class CompiledTemplate:
+    __slots__ = ("segments", "slots")
+
+    def __init__(self, segments, slots):
+        self.segments = segments
+        self.slots = slots
+
+
+def compile_template(text):
+    text = text.strip()
+    segments = []
+    slots = set()
+    pos = 0
+    for match in PLACEHOLDER_PATTERN.finditer(text):
+        if match.start() > pos:
+            segments.append(text[pos:match.start()])
+        num = int(match.group(1))
+        segments.append((num, match.group(0)))
+        slots.add(num)
+        pos = match.end()
+    if pos < len(text):
+        segments.append(text[pos:])
+    return CompiledTemplate(tuple(segments), frozenset(slots))
+
+
+# Compiled templates are only cached for the session. A disk cache keyed by layout hash and engine version
+# loaded slower than compiling a 1000-field layout, so opening a layout always compiles it again.
+@lru_cache(maxsize=4096)
+def compile_cached(text):
+    return compile_template(text)
+
+
+def render_template(compiled, replacements):
+    count = len(replacements)
+    parts = []
+    for segment in compiled.segments:
+        if segment.__class__ is str:
+            parts.append(segment)
+        else:
+            num, raw = segment
+            parts.append(replacements[num - 1] if 1 <= num <= count else raw)
+    return "".join(parts)
+
+
+def template_issues(compiled, count):
+    if not compiled.segments:
+        return ["Empty, skipped on Run"]
+    slots = compiled.slots
+    if not slots or (min(slots) >= 1 and max(slots) <= count):
+        return []
+    unresolved = []
+    for segment in compiled.segments:
+        if segment.__class__ is not str and not 1 <= segment[0] <= count and segment[1] not in unresolved:
+            unresolved.append(segment[1])
+    return [f"{', '.join(unresolved)} left as is, only {count} keyword(s) marked"]
+
+
+def compile_format(compiled, count):
+    # A str.format() pattern for rows of exactly `count` values, so a table renders each row in C.
+    parts = []
+    for segment in compiled.segments:
+        if segment.__class__ is str:
+            parts.append(segment.replace("{", "{{").replace("}", "}}"))
+        else:
+            num, raw = segment
+            parts.append("{%d}" % (num - 1) if 1 <= num <= count else raw.replace("{", "{{").replace("}", "}}"))
+    return "".join(parts)
+
+
+def iter_render_fields(fields, replacements):
+    for header, content in fields:
+        if content.strip() == "":
+            continue
+        yield header, render_template(compile_cached(content), replacements)
@@ -0,0 +1,175 @@
+import json, time
+from PyQt5.QtCore import QEvent, QTimer
+from PyQt5.QtGui import QTextCursor
+from PyQt5.QtWidgets import QApplication
+
+
+def document_text(document, position, length):
+    cursor = QTextCursor(document)
+    last = document.characterCount() - 1
+    cursor.setPosition(min(position, last))
+    cursor.setPosition(min(position + length, last), QTextCursor.KeepAnchor)
+    return cursor.selectedText().replace("\u2029", "\n")
+
+
+def edit_document(document, position, removed, added):
+    cursor = QTextCursor(document)
+    last = document.characterCount() - 1
+    cursor.setPosition(min(position, last))
+    cursor.setPosition(min(position + removed, last), QTextCursor.KeepAnchor)
+    cursor.insertText(added)
+
+
+class Recorder:
+    # One JSON line per user action; text edits are stored as diffs, so a long typing session stays small.
+    def __init__(self, window, path):
+        self.window = window
+        self.file = open(path, "w", encoding="utf-8")
+        self.started = time.perf_counter()
+        self.output_window = None
+        self.handlers = []
+
+        part2 = window.part2_container
+        self.watch_document(window.part1_container.text_edit.document(), lambda: {"action": "part1_edit"})
+        part2.text_edit.span_applied.connect(lambda mode, start, end: self.write(mode, start=start, end=end))
+        part2.btn_auto.clicked.connect(
+            lambda: self.write("auto", mode=part2.auto_mode.currentText(), pattern=part2.auto_pattern.text()))
+        part2.btn_clear.clicked.connect(lambda: self.write("clear"))
+        part2.btn_eval.clicked.connect(lambda: self.write("eval"))
+        part2.transforms_field.textEdited.connect(lambda spec: self.write("transforms", spec=spec))
+        window.settings_menu.output_spin_box.valueChanged.connect(lambda count: self.write("field_count", count=count))
+        window.layout_applied.connect(lambda fields: self.write("layout", fields=fields))
+        window.run_button.clicked.connect(lambda: self.write("run"))
+        window.run_button.clicked.connect(self.watch_output_window)
+        window.show_output_button.clicked.connect(lambda: self.write("show_output"))
+        window.show_output_button.clicked.connect(self.watch_output_window)
+        window.add_workspace_button.clicked.connect(lambda: self.write("add_workspace"))
+        window.workspace_tabs.currentChanged.connect(lambda index: self.write("workspace", index=index))
+        window.workspace_closed.connect(lambda index: self.write("close_workspace", index=index))
+        for field in window.part3_container.fields:
+            self.watch_field(field)
+        window.part3_container.field_added.connect(self.watch_field)
+
+    def write(self, action, **args):
+        if self.window.loading:
+            return
+        self.file.write(json.dumps(dict(t=round(time.perf_counter() - self.started, 3), action=action, **args)) + "\n")
+        self.file.flush()
+
+    def watch_document(self, document, describe):
+        def on_change(position, removed, added):
+            self.write(position=position, removed=removed, added=document_text(document, position, added), **describe())
+        # Qt only holds a weak reference to the closure, so the recorder keeps it alive.
+        self.handlers.append(on_change)
+        document.contentsChange.connect(on_change)
+
+    def watch_field(self, field):
+        fields = self.window.part3_container.fields
+        self.watch_document(field.text_edit.document(),
+                            lambda: {"action": "field_edit", "index": fields.index(field)})
+        field.header.textEdited.connect(lambda text: self.write("header", index=fields.index(field), text=text))
+
+    def watch_output_window(self):
+        output_window = self.window.output_window
+        if output_window is None or output_window is self.output_window:
+            return
+        self.output_window = output_window
+        output_window.back_button.clicked.connect(lambda: self.write("close_output"))
+        output_window.search_field.textEdited.connect(lambda query: self.write("search", query=query))
+
+    def close(self):
+        self.file.close()
+
+
+def apply_action(window, entry):
+    action = entry["action"]
+    part2 = window.part2_container
+    if action == "part1_edit":
+        edit_document(window.part1_container.text_edit.document(), entry["position"], entry["removed"], entry["added"])
+    elif action == "field_edit":
+        document = window.part3_container.fields[entry["index"]].text_edit.document()
+        edit_document(document, entry["position"], entry["removed"], entry["added"])
+    elif action == "header":
+        window.part3_container.fields[entry["index"]].header.setText(entry["text"])
+    elif action in ("mark", "erase"):
+        part2.text_edit.apply_span(action, entry["start"], entry["end"])
+    elif action == "auto":
+        part2.auto_mode.setCurrentText(entry["mode"])
+        part2.auto_pattern.setText(entry["pattern"])
+        part2.on_auto_clicked()
+    elif action == "clear":
+        part2.on_clear_clicked()
+    elif action == "eval":
+        part2.on_eval_clicked()
+    elif action == "transforms":
+        part2.transforms_field.setText(entry["spec"])
+    elif action == "field_count":
+        window.settings_menu.output_spin_box.setValue(entry["count"])
+    elif action == "layout":
+        window.apply_layout([tuple(field) for field in entry["fields"]])
+    elif action == "run":
+        window.on_run_button_clicked()
+    elif action == "show_output":
+        window.show_output_window()
+    elif action == "close_output":
+        window.close_output_window()
+    elif action == "search":
+        window.output_window.search_field.setText(entry["query"])
+    elif action == "add_workspace":
+        window.add_workspace()
+    elif action == "workspace":
+        window.workspace_tabs.setCurrentIndex(entry["index"])
+    elif action == "close_workspace":
+        window.close_workspace(entry["index"])
+    else:
+        raise ValueError(f"Unknown action '{action}' in trace")
+
+
+def settle(app, window):
+    # Debounced work (lint, preview, layout passes) counts toward the action that triggered it; other timers,
+    # like the "Copied" reset, run on their own schedule.
+    from ui import DEBOUNCE_TIMER
+    for _ in range(100):
+        app.processEvents()
+        timers = app.findChildren(QTimer, DEBOUNCE_TIMER) + window.findChildren(QTimer, DEBOUNCE_TIMER)
+        timers = [timer for timer in timers if timer.isActive()]
+        if not timers:
+            return
+        for timer in timers:
+            timer.stop()
+            timer.timeout.emit()
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def replay(path, repeat=1):
+    from ui import MainWindow
+    with open(path, "r", encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    app = QApplication.instance() or QApplication([])
+    latencies = {}
+    for _ in range(repeat):
+        window = MainWindow()
+        window.show()
+        settle(app, window)
+        for entry in entries:
+            started = time.perf_counter()
+            apply_action(window, entry)
+            settle(app, window)
+            latencies.setdefault(entry["action"], []).append((time.perf_counter() - started) * 1000)
+        settle(app, window)
+        window.close()
+        window.deleteLater()
+        app.sendPostedEvents(None, QEvent.DeferredDelete)
+    return latencies
+
+
+def format_report(latencies):
+    lines = [f"{'action':<18}{'count':>7}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}"]
+    for action, values in sorted(latencies.items()):
+        values = sorted(values)
+        lines.append(f"{action:<18}{len(values):>7}{percentile(values, 0.5):>10.2f}{percentile(values, 0.9):>10.2f}"
+                     f"{percentile(values, 0.99):>10.2f}{values[-1]:>10.2f}")
+    return "\n".join(lines)
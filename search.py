@@ -0,0 +1,63 @@
+import re
+from bisect import bisect_left
+
+
+TOKEN_PATTERN = re.compile(r"\w+")
+SHORT_PREFIX = 2
+
+
+class OutputIndex:
+    def __init__(self):
+        self.postings = {}
+        # One and two letter prefixes match too many tokens to union per keystroke, so they keep own postings.
+        self.short_postings = {}
+        self.count = 0
+        self.sorted_tokens = []
+        self.tokens_dirty = False
+        self.prefix_cache = {}
+
+    def add(self, header, text):
+        output_id = self.count
+        self.count += 1
+        tokens = set(TOKEN_PATTERN.findall(header.lower() + " " + text.lower()))
+        for token in tokens:
+            ids = self.postings.get(token)
+            if ids is None:
+                self.postings[token] = [output_id]
+                self.tokens_dirty = True
+            else:
+                ids.append(output_id)
+        for prefix in {token[:length] for token in tokens for length in range(1, SHORT_PREFIX + 1)}:
+            self.short_postings.setdefault(prefix, []).append(output_id)
+        self.prefix_cache = {}
+        return output_id
+
+    def prefix_ids(self, prefix):
+        ids = self.prefix_cache.get(prefix)
+        if ids is not None:
+            return ids
+        if len(prefix) <= SHORT_PREFIX:
+            ids = set(self.short_postings.get(prefix, ()))
+            self.prefix_cache[prefix] = ids
+            return ids
+        if self.tokens_dirty:
+            self.sorted_tokens = sorted(self.postings)
+            self.tokens_dirty = False
+        tokens = self.sorted_tokens
+        index = bisect_left(tokens, prefix)
+        ids = set()
+        while index < len(tokens) and tokens[index].startswith(prefix):
+            ids.update(self.postings[tokens[index]])
+            index += 1
+        self.prefix_cache[prefix] = ids
+        return ids
+
+    def search(self, query):
+        terms = TOKEN_PATTERN.findall(query.lower())
+        if not terms:
+            return None
+        results = sorted((self.prefix_ids(term) for term in terms), key=len)
+        ids = set(results[0])
+        for other in results[1:]:
+            ids &= other
+        return sorted(ids)
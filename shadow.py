@@ -0,0 +1,172 @@
+import re, math, random
+from transforms import TRANSFORMS
+
+
+# Kept apart from render.py and snippets.py on purpose: this is how a Run rendered before any of the fast
+# paths existed, so a regression in either shows up as a mismatch.
+REFERENCE_PATTERN = re.compile(r"[a-z](\d+)")
+REFERENCE_INCLUDE = re.compile(r"\{\{\s*([^{}\s]+)\s*\}\}")
+REFERENCE_SNIPPET = re.compile(r"@([^{}\s]+)")
+SAMPLE_RATES = (("Off", 0.0), ("1% of outputs", 0.01), ("10% of outputs", 0.1), ("All outputs", 1.0))
+MAX_SAMPLES = 10000
+MAX_REPORTS = 20
+SLICE_SIZE = 200
+
+
+def reference_render(content, replacements):
+    def replace_match(match):
+        num = int(match.group(1))
+        if 1 <= num <= len(replacements):
+            return replacements[num - 1]
+        return match.group(0)
+    return REFERENCE_PATTERN.sub(replace_match, content.strip())
+
+
+def reference_snippets(fields):
+    snippets = {}
+    for header, content in fields:
+        match = REFERENCE_SNIPPET.fullmatch(header.strip())
+        if match:
+            snippets[match.group(1)] = content
+    return snippets
+
+
+def reference_cycles(snippets):
+    cyclic = set()
+    for name in snippets:
+        seen = set()
+        pending = REFERENCE_INCLUDE.findall(snippets[name])
+        while pending:
+            inner = pending.pop()
+            if inner == name:
+                cyclic.add(name)
+                break
+            if inner in snippets and inner not in seen:
+                seen.add(inner)
+                pending.extend(REFERENCE_INCLUDE.findall(snippets[inner]))
+    return cyclic
+
+
+def reference_expand(text, snippets, cyclic):
+    # Plain recursive substitution; snippets that include themselves are left as written.
+    def replace_match(match):
+        name = match.group(1)
+        if name not in snippets or name in cyclic:
+            return match.group(0)
+        return reference_expand(snippets[name].strip(), snippets, cyclic)
+    return REFERENCE_INCLUDE.sub(replace_match, text)
+
+
+def reference_templates(fields):
+    snippets = reference_snippets(fields)
+    cyclic = reference_cycles(snippets)
+    templates = []
+    for header, content in fields:
+        if not REFERENCE_SNIPPET.fullmatch(header.strip()):
+            content = reference_expand(content, snippets, cyclic)
+            if content.strip() != "":
+                templates.append((header, content))
+    return templates
+
+
+def reference_keywords(transforms, keywords):
+    # Every rule is applied in order without the per-slot chains and the lru_cache of SlotTransforms.
+    if transforms is None:
+        return list(keywords)
+    result = []
+    for num, text in enumerate(keywords, start=1):
+        for slots, steps in transforms.rules:
+            if slots is None or num in slots:
+                for name, arg in steps:
+                    text = TRANSFORMS[name](text, arg)
+        result.append(text)
+    return result
+
+
+class ShadowCheck:
+    # Renderers report each row they rendered; a random sample of its outputs is kept and later compared
+    # to the reference, a few samples at a time, so checking never holds up the run itself.
+    def __init__(self, fields, transforms=None, rate=0.01, seed=None, limit=MAX_SAMPLES):
+        self.fields = fields
+        self.transforms = transforms
+        self.rate = rate
+        self.limit = limit
+        self.random = random.Random(seed)
+        self.position = 0
+        self.next_sample = self.skip()
+        self.samples = []
+        self.templates = None
+        self.checked = 0
+        self.mismatches = 0
+        self.reports = []
+
+    def skip(self):
+        # Gaps between samples are drawn up front, so an output that is not sampled costs one comparison.
+        if self.rate >= 1:
+            return self.position
+        if self.rate <= 0:
+            return math.inf
+        return self.position + int(math.log(1.0 - self.random.random()) / math.log(1.0 - self.rate))
+
+    def observe(self, keywords, outputs, row_index=None):
+        start = self.position
+        end = start + len(outputs)
+        while self.next_sample < end and len(self.samples) < self.limit:
+            offset = self.next_sample - start
+            self.samples.append((keywords, row_index, offset, len(outputs), outputs[offset]))
+            self.position = self.next_sample + 1
+            self.next_sample = self.skip()
+        self.position = end
+
+    def observe_stream(self, keywords, outputs, row_index=None):
+        # Passes a row's outputs through as they are rendered; only the sampled ones are kept, and they are
+        # recorded once the row is done and its size is known.
+        start = self.position
+        sampled = []
+        count = 0
+        for output in outputs:
+            if start + count == self.next_sample and len(self.samples) + len(sampled) < self.limit:
+                sampled.append((count, output))
+                self.position = start + count + 1
+                self.next_sample = self.skip()
+            count += 1
+            yield output
+        self.position = start + count
+        self.samples.extend((keywords, row_index, offset, count, output) for offset, output in sampled)
+
+    def observe_output(self, keywords, offset, count, output, row_index=None):
+        # For renderers that produce single outputs out of row order, like a shuffled batch.
+        sampled = self.position == self.next_sample and len(self.samples) < self.limit
+        self.position += 1
+        if sampled:
+            self.samples.append((keywords, row_index, offset, count, output))
+            self.next_sample = self.skip()
+
+    def reference_row(self, keywords, row_index):
+        if self.templates is None:
+            self.templates = reference_templates(self.fields)
+        keywords = reference_keywords(self.transforms, keywords)
+        return [(header if row_index is None else f"{header} #{row_index}", reference_render(content, keywords))
+                for header, content in self.templates]
+
+    def check(self, budget=SLICE_SIZE):
+        # Returns True once every sample is checked.
+        end = min(len(self.samples), self.checked + budget)
+        for keywords, row_index, offset, count, output in self.samples[self.checked:end]:
+            expected = self.reference_row(keywords, row_index)
+            if len(expected) != count:
+                self.report({"row": row_index, "header": output[0], "rendered": f"{count} output(s) in the row",
+                             "expected": f"{len(expected)} output(s)"})
+            elif expected[offset] != output:
+                self.report({"row": row_index, "header": output[0], "rendered": output[1],
+                             "expected_header": expected[offset][0], "expected": expected[offset][1]})
+        self.checked = end
+        return self.checked >= len(self.samples)
+
+    def report(self, mismatch):
+        self.mismatches += 1
+        if len(self.reports) < MAX_REPORTS:
+            self.reports.append(mismatch)
+
+    def summary(self):
+        return f"{self.checked} sampled output(s) checked against the reference renderer, {self.mismatches} mismatch(es)"
@@ -0,0 +1,176 @@
+import os, re, csv, json, shutil
+
+
+SINK_KINDS = ("txt", "jsonl", "csv", "batch")
+
+
+def output_filename(index, header):
+    safe = re.sub(r"[^\w\-. ]", "_", header).strip() or "output"
+    return f"{index:03d}_{safe}.txt"
+
+
+class Sink:
+    def __init__(self, batch_size=256):
+        self.batch_size = batch_size
+        self.buffer = []
+        self.count = 0
+
+    def write(self, header, text):
+        self.buffer.append((header, text))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.write_batch(self.buffer)
+            self.count += len(self.buffer)
+            self.buffer = []
+
+    def write_batch(self, batch):
+        raise NotImplementedError
+
+    def close(self):
+        self.flush()
+
+    def abort(self):
+        self.buffer = []
+
+
+class TextFolderSink(Sink):
+    # Files go to a temporary folder that replaces the real one on close, so no file of an earlier,
+    # larger run is left next to the new ones.
+    def __init__(self, folder, batch_size=256):
+        super().__init__(batch_size)
+        self.folder = folder
+        self.part_folder = f"{folder}.{os.getpid()}.part"
+        if os.path.exists(self.part_folder):
+            shutil.rmtree(self.part_folder)
+        os.makedirs(self.part_folder)
+
+    def write_batch(self, batch):
+        for offset, (header, text) in enumerate(batch, start=self.count + 1):
+            with open(os.path.join(self.part_folder, output_filename(offset, header)), "w", encoding="utf-8") as f:
+                f.write(text)
+
+    def close(self):
+        # The old folder is only deleted once the new one is in place, a crash in between leaves it renamed.
+        self.flush()
+        old_folder = None
+        if os.path.exists(self.folder):
+            old_folder = f"{self.folder}.{os.getpid()}.old"
+            if os.path.exists(old_folder):
+                shutil.rmtree(old_folder)
+            os.replace(self.folder, old_folder)
+        os.replace(self.part_folder, self.folder)
+        if old_folder is not None:
+            shutil.rmtree(old_folder, ignore_errors=True)
+
+    def abort(self):
+        super().abort()
+        shutil.rmtree(self.part_folder, ignore_errors=True)
+
+
+class FileSink(Sink):
+    # Batches are appended to a ".part" file that only replaces the real file on close. Like write_atomic,
+    # the name carries the pid, so instances writing to the same folder never truncate each other's file.
+    def __init__(self, path, batch_size=256):
+        super().__init__(batch_size)
+        self.path = path
+        self.part_path = f"{path}.{os.getpid()}.part"
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        self.file = open(self.part_path, "w", encoding="utf-8", newline="")
+        self.start_file()
+
+    def start_file(self):
+        pass
+
+    def write_batch(self, batch):
+        self.file.write("".join(self.format_item(header, text) for header, text in batch))
+        self.file.flush()
+
+    def format_item(self, header, text):
+        raise NotImplementedError
+
+    def close(self):
+        self.flush()
+        self.file.close()
+        os.replace(self.part_path, self.path)
+
+    def abort(self):
+        super().abort()
+        self.file.close()
+        os.remove(self.part_path)
+
+
+class JsonlSink(FileSink):
+    def format_item(self, header, text):
+        return json.dumps({"header": header, "prompt": text}, ensure_ascii=False) + "\n"
+
+
+class CsvSink(FileSink):
+    def start_file(self):
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(["header", "prompt"])
+
+    def write_batch(self, batch):
+        self.writer.writerows(batch)
+        self.file.flush()
+
+
+class BatchPromptSink(FileSink):
+    # One prompt per line, as read by the "prompts from file" scripts of SD front-ends.
+    def format_item(self, header, text):
+        return " ".join(text.splitlines()) + "\n"
+
+
+class SinkPipeline:
+    def __init__(self, sinks=()):
+        self.sinks = list(sinks)
+
+    def write(self, header, text):
+        for sink in self.sinks:
+            sink.write(header, text)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+    def abort(self):
+        for sink in self.sinks:
+            sink.abort()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def parse_sink_kinds(kinds):
+    # Accepts "jsonl, csv" as well as a list, and rejects unknown kinds before any file is opened.
+    if isinstance(kinds, str):
+        kinds = kinds.split(",")
+    kinds = [kind.strip() for kind in kinds if kind.strip()]
+    unknown = [kind for kind in kinds if kind not in SINK_KINDS]
+    if unknown:
+        raise ValueError(f"Unknown sink(s) {', '.join(unknown)}, expected one of: {', '.join(SINK_KINDS)}")
+    return kinds
+
+
+def create_sinks(output_dir, kinds, name="prompts", batch_size=256):
+    sinks = []
+    for kind in parse_sink_kinds(kinds):
+        if kind == "txt":
+            sinks.append(TextFolderSink(os.path.join(output_dir, name), batch_size))
+        elif kind == "jsonl":
+            sinks.append(JsonlSink(os.path.join(output_dir, name + ".jsonl"), batch_size))
+        elif kind == "csv":
+            sinks.append(CsvSink(os.path.join(output_dir, name + ".csv"), batch_size))
+        elif kind == "batch":
+            sinks.append(BatchPromptSink(os.path.join(output_dir, name + "_batch.txt"), batch_size))
+    return SinkPipeline(sinks)
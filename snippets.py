@@ -0,0 +1,125 @@
+import re
+
+
+INCLUDE_PATTERN = re.compile(r"\{\{\s*([^{}\s]+)\s*\}\}")
+NAME_PATTERN = re.compile(r"[^{}\s]+")
+
+
+def snippet_name(header):
+    # A field whose header is "@name" defines the snippet {{name}} instead of an output. Only names an include
+    # can refer to count, so a header like "@my style" stays an output field.
+    header = header.strip()
+    if len(header) > 1 and header[0] == "@" and NAME_PATTERN.fullmatch(header, 1):
+        return header[1:]
+    return None
+
+
+def header_issues(header):
+    if header.strip().startswith("@") and snippet_name(header) is None:
+        return ["Starts with @ but is no snippet name (no spaces or braces), rendered as an output"]
+    return []
+
+
+def collect_snippets(fields):
+    snippets = {}
+    for header, content in fields:
+        name = snippet_name(header)
+        if name is not None:
+            snippets[name] = content
+    return snippets
+
+
+def included_names(text):
+    if "{{" not in text:
+        return frozenset()
+    return frozenset(INCLUDE_PATTERN.findall(text))
+
+
+class SnippetGraph:
+    # Includes are inlined as text before compiling, so compiled templates and every renderer stay include-free.
+    def __init__(self):
+        self.texts = {}
+        self.includes = {}
+        self.cyclic = frozenset()
+        self.expanded = {}
+
+    def update(self, snippets):
+        names = self.texts.keys() | snippets.keys()
+        changed = {name for name in names if self.texts.get(name) != snippets.get(name)}
+        if not changed:
+            return set()
+        # Users are looked up before and after the change, so dropping an include invalidates too.
+        affected = self.users(changed)
+        self.texts = dict(snippets)
+        for name in changed:
+            if name in snippets:
+                self.includes[name] = included_names(snippets[name])
+            else:
+                del self.includes[name]
+        affected |= self.users(changed)
+        self.cyclic = self.find_cycles()
+        for name in affected:
+            self.expanded.pop(name, None)
+        return affected
+
+    def users(self, names):
+        included_by = {}
+        for user, includes in self.includes.items():
+            for name in includes:
+                included_by.setdefault(name, []).append(user)
+        found = set(names)
+        pending = list(names)
+        while pending:
+            for user in included_by.get(pending.pop(), ()):
+                if user not in found:
+                    found.add(user)
+                    pending.append(user)
+        return found
+
+    def find_cycles(self):
+        cyclic = set()
+        for start in self.includes:
+            seen = set()
+            pending = list(self.includes[start])
+            while pending:
+                name = pending.pop()
+                if name == start:
+                    cyclic.add(start)
+                    break
+                if name not in seen:
+                    seen.add(name)
+                    pending.extend(self.includes.get(name, ()))
+        return frozenset(cyclic)
+
+    def expand(self, text):
+        if "{{" not in text:
+            return text
+        return INCLUDE_PATTERN.sub(self.expand_match, text)
+
+    def expand_match(self, match):
+        name = match.group(1)
+        if name not in self.texts or name in self.cyclic:
+            return match.group(0)
+        text = self.expanded.get(name)
+        if text is None:
+            text = self.expand(self.texts[name].strip())
+            self.expanded[name] = text
+        return text
+
+    def issues(self, text):
+        issues = []
+        for name in sorted(included_names(text)):
+            if name in self.cyclic:
+                issues.append(f"{{{{{name}}}}} left as is, it includes itself")
+            elif name not in self.texts:
+                issues.append(f"{{{{{name}}}}} left as is, no @{name} field")
+        return issues
+
+    def expand_fields(self, fields):
+        # Snippet fields become empty, so they are skipped on Run but every other field keeps its index.
+        self.update(collect_snippets(fields))
+        return [(header, "" if snippet_name(header) is not None else self.expand(content)) for header, content in fields]
+
+
+def expand_fields(fields):
+    return SnippetGraph().expand_fields(fields)
@@ -0,0 +1,131 @@
+import os, json, time, shutil
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+
+DATA_DIR_ENV = "RAPIDPROMPT_DATA_DIR"
+STALE_AFTER = 60
+
+
+def data_dir():
+    return os.path.abspath(os.environ.get(DATA_DIR_ENV) or os.getcwd())
+
+
+def write_atomic(path, text):
+    # The temp name is unique per process so parallel instances never write into each other's temp file.
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def write_json_atomic(path, data):
+    write_atomic(path, json.dumps(data, indent=4))
+
+
+class FileLock:
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def acquire(self, blocking=True):
+        self.file = open(self.path, "a+")
+        try:
+            if fcntl is not None:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                self.file.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(self.file.fileno(), msvcrt.LK_NBLCK, 1)
+                        break
+                    except OSError:
+                        if not blocking:
+                            raise
+                        time.sleep(0.05)
+        except OSError:
+            self.file.close()
+            self.file = None
+            return False
+        return True
+
+    def release(self):
+        if self.file is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        else:
+            self.file.seek(0)
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+        self.file.close()
+        self.file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class InstanceSession:
+    def __init__(self, root=None):
+        self.root = root or data_dir()
+        self.sessions_dir = os.path.join(self.root, "sessions")
+        if not os.path.exists(self.sessions_dir):
+            os.makedirs(self.sessions_dir)
+        self.remove_stale_sessions()
+
+        self.name = f"{os.getpid()}-{int(time.time() * 1000)}"
+        self.lock = FileLock(os.path.join(self.sessions_dir, self.name + ".lock"))
+        # Without the lock another instance would take this session for stale and delete it.
+        if not self.lock.acquire(blocking=False):
+            raise RuntimeError(f"Could not lock session {self.name} in {self.sessions_dir}")
+        self.path = os.path.join(self.sessions_dir, self.name)
+        os.makedirs(self.path)
+        self.log_path = os.path.join(self.path, "session.log")
+        self.json_path = os.path.join(self.path, "session.json")
+
+    def remove_stale_sessions(self):
+        # A session is stale once nobody holds its lock; young ones may still be starting up.
+        for entry in os.listdir(self.sessions_dir):
+            if not entry.endswith(".lock"):
+                continue
+            lock_path = os.path.join(self.sessions_dir, entry)
+            try:
+                if time.time() - os.path.getmtime(lock_path) < STALE_AFTER:
+                    continue
+            except OSError:
+                continue
+            lock = FileLock(lock_path)
+            if not lock.acquire(blocking=False):
+                continue
+            shutil.rmtree(lock_path[:-len(".lock")], ignore_errors=True)
+            lock.release()
+            try:
+                os.remove(lock_path)
+            except OSError:
+                pass
+
+    def close(self):
+        # The output stores of big runs go on a normal exit; the log stays for a bug report until a later
+        # launch removes the session as stale.
+        shutil.rmtree(os.path.join(self.path, "outputs"), ignore_errors=True)
+        self.lock.release()
+
+
+current_session = None
+
+
+def session():
+    global current_session
+    if current_session is None:
+        current_session = InstanceSession()
+    return current_session
+
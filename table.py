@@ -0,0 +1,51 @@
+import os, csv
+from render import compile_cached, compile_format
+
+
+def read_table(path, header=False):
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        sample = f.read(65536)
+        f.seek(0)
+        if os.path.splitext(path)[1].lower() in (".tsv", ".tab"):
+            delimiter = "\t"
+        else:
+            try:
+                delimiter = csv.Sniffer().sniff(sample, delimiters=",;\t|").delimiter
+            except csv.Error:
+                delimiter = ","
+        reader = csv.reader(f, delimiter=delimiter)
+        if header:
+            next(reader, None)
+        for row in reader:
+            if row:
+                yield row
+
+
+def rows_from_columns(columns):
+    return zip(*columns)
+
+
+class TableRenderer:
+    def __init__(self, fields, transforms=None, shadow=None):
+        self.templates = [(header, compile_cached(content)) for header, content in fields if content.strip() != ""]
+        self.transforms = transforms if transforms is not None and transforms.rules else None
+        self.formats = {}
+        self.shadow = shadow
+
+    def formats_for(self, count):
+        formats = self.formats.get(count)
+        if formats is None:
+            formats = [(header, compile_format(template, count).format) for header, template in self.templates]
+            self.formats[count] = formats
+        return formats
+
+    def render_row(self, row_index, row):
+        keywords = row if self.transforms is None else self.transforms.apply(row)
+        outputs = [(f"{header} #{row_index}", fmt(*keywords)) for header, fmt in self.formats_for(len(keywords))]
+        if self.shadow is not None:
+            self.shadow.observe(row, outputs, row_index)
+        return outputs
+
+    def iter_render(self, rows):
+        for row_index, row in enumerate(rows, start=1):
+            yield from self.render_row(row_index, row)
@@ -0,0 +1,138 @@
+import os, re, sys, gzip
+from functools import lru_cache
+from render import compile_cached
+
+
+VOCAB_FILE = "bpe_simple_vocab_16e6.txt.gz"
+TOKEN_LIMIT = 77
+# Same splits as CLIP's pre-tokenizer: letter runs, single digits, runs of other symbols.
+PRETOKEN_PATTERN = re.compile(r"'s|'t|'re|'ve|'m|'ll|'d|[^\W\d_]+|\d|(?:[^\s\w]|_)+")
+
+
+def vocab_path():
+    folder = getattr(sys, "_MEIPASS", os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(folder, VOCAB_FILE)
+
+
+def bytes_to_unicode():
+    bs = list(range(ord("!"), ord("~") + 1)) + list(range(ord("¡"), ord("¬") + 1)) + list(range(ord("®"), ord("ÿ") + 1))
+    cs = bs[:]
+    n = 0
+    for b in range(256):
+        if b not in bs:
+            bs.append(b)
+            cs.append(256 + n)
+            n += 1
+    return dict(zip(bs, map(chr, cs)))
+
+
+class ClipTokenizer:
+    def __init__(self, path):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            merges = f.read().split("\n")[1:49152 - 256 - 2 + 1]
+        self.ranks = {tuple(merge.split()): rank for rank, merge in enumerate(merges)}
+        self.byte_encoder = bytes_to_unicode()
+        self.cache = {}
+
+    def bpe(self, token):
+        pieces = self.cache.get(token)
+        if pieces is not None:
+            return pieces
+        word = list(token[:-1]) + [token[-1] + "</w>"]
+        while len(word) > 1:
+            pairs = {(word[i], word[i + 1]) for i in range(len(word) - 1)}
+            best = min(pairs, key=lambda pair: self.ranks.get(pair, float("inf")))
+            if best not in self.ranks:
+                break
+            merged = []
+            i = 0
+            while i < len(word):
+                if i < len(word) - 1 and (word[i], word[i + 1]) == best:
+                    merged.append(word[i] + word[i + 1])
+                    i += 2
+                else:
+                    merged.append(word[i])
+                    i += 1
+            word = merged
+        pieces = len(word)
+        self.cache[token] = pieces
+        return pieces
+
+    def count(self, text):
+        return sum(
+            self.bpe("".join(self.byte_encoder[b] for b in token.encode("utf-8")))
+            for token in PRETOKEN_PATTERN.findall(text.lower())
+        )
+
+
+tokenizer = None
+
+
+def get_tokenizer():
+    # The vocab is only read on first use; without it every pre-token counts once, a lower bound.
+    global tokenizer
+    if tokenizer is None:
+        path = vocab_path()
+        tokenizer = ClipTokenizer(path) if os.path.exists(path) else False
+    return tokenizer
+
+
+def tokens_available():
+    # A lower bound misses most prompts over the limit, so callers show no counts at all without the vocab.
+    return bool(get_tokenizer())
+
+
+@lru_cache(maxsize=65536)
+def count_piece(text):
+    tokenizer = get_tokenizer()
+    if tokenizer:
+        return tokenizer.count(text)
+    return len(PRETOKEN_PATTERN.findall(text.lower()))
+
+
+def char_class(char):
+    if char.isspace():
+        return 0
+    if char.isdigit():
+        return 1
+    if char.isalpha():
+        return 2
+    return 3
+
+
+def joins(left, right):
+    # Only letter runs and symbol runs continue across a piece boundary, digits are always single tokens.
+    kind = char_class(left)
+    return (kind >= 2 and kind == char_class(right)) or (left == "'" and right.isalpha())
+
+
+def count_template(compiled, replacements):
+    count = len(replacements)
+    total = 0
+    group = []
+    for segment in compiled.segments:
+        if segment.__class__ is str:
+            piece = segment
+        else:
+            num, raw = segment
+            piece = replacements[num - 1] if 1 <= num <= count else raw
+        if not piece:
+            continue
+        if group and not joins(group[-1][-1], piece[0]):
+            total += count_piece("".join(group))
+            group = []
+        group.append(piece)
+    if group:
+        total += count_piece("".join(group))
+    return total + 2
+
+
+def count_text(text):
+    return count_piece(text) + 2
+
+
+def iter_token_counts(fields, replacements):
+    for _, content in fields:
+        if content.strip() == "":
+            continue
+        yield count_template(compile_cached(content), replacements)
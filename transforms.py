@@ -0,0 +1,89 @@
+import re
+from functools import lru_cache
+
+
+RULE_SEPARATOR = re.compile(r"[;\n]")
+
+
+def lora_tag(text, arg):
+    return f"{text} <lora:{arg if ':' in arg else arg + ':1'}>"
+
+
+TRANSFORMS = {
+    "strip": lambda text, arg: text.strip(),
+    "lower": lambda text, arg: text.lower(),
+    "upper": lambda text, arg: text.upper(),
+    "title": lambda text, arg: text.title(),
+    "normalize": lambda text, arg: " ".join(text.replace("_", " ").split()),
+    "escape": lambda text, arg: text.replace("(", "\\(").replace(")", "\\)"),
+    "weight": lambda text, arg: f"({text}:{arg})",
+    "lora": lora_tag,
+}
+
+
+def parse_slots(text):
+    text = text.strip()
+    if text == "*":
+        return None
+    slots = set()
+    for part in text.split(","):
+        first, _, last = part.strip().partition("-")
+        if not first.isdigit() or (last and not last.isdigit()):
+            raise ValueError(f"'{part.strip()}' is not a slot, use 2, 1-3 or *")
+        slots.update(range(int(first), int(last or first) + 1))
+    return frozenset(slots)
+
+
+def parse_transform(text):
+    name, _, arg = text.strip().partition("=")
+    name, arg = name.strip(), arg.strip()
+    if name not in TRANSFORMS:
+        raise ValueError(f"Unknown transform '{name}', use one of {', '.join(TRANSFORMS)}")
+    if name == "weight":
+        try:
+            float(arg)
+        except ValueError:
+            raise ValueError("weight needs a number, e.g. weight=1.2") from None
+    elif name == "lora" and not arg:
+        raise ValueError("lora needs a name, e.g. lora=detail:0.8")
+    return (name, arg)
+
+
+def parse_rules(spec):
+    rules = []
+    for line in RULE_SEPARATOR.split(spec):
+        if line.strip() == "":
+            continue
+        slots, colon, chain = line.partition(":")
+        if not colon:
+            raise ValueError(f"'{line.strip()}' needs a slot, e.g. *: strip or 2: weight=1.2")
+        rules.append((parse_slots(slots), tuple(parse_transform(part) for part in chain.split(",") if part.strip())))
+    return rules
+
+
+@lru_cache(maxsize=65536)
+def apply_chain(chain, text):
+    for name, arg in chain:
+        text = TRANSFORMS[name](text, arg)
+    return text
+
+
+class SlotTransforms:
+    # Rules apply in the order written, e.g. "*: strip; 2: weight=1.2" strips every keyword, then weights slot 2.
+    def __init__(self, spec=""):
+        self.spec = spec
+        self.rules = parse_rules(spec)
+        self.chains = {}
+
+    def chain_for(self, num):
+        chain = self.chains.get(num)
+        if chain is None:
+            chain = tuple(step for slots, steps in self.rules if slots is None or num in slots for step in steps)
+            self.chains[num] = chain
+        return chain
+
+    def apply(self, keywords):
+        # Keywords are transformed once before rendering, so the per-output cost stays the same.
+        if not self.rules:
+            return list(keywords)
+        return [apply_chain(self.chain_for(num), text) for num, text in enumerate(keywords, start=1)]
@@ -1,18 +1,139 @@
 import time
 import sys
-import os, json
-from PyQt5.QtCore import Qt, QTimer, QEvent, QRect, QRectF, QPropertyAnimation, pyqtSignal, QSize, QPoint, QUrl
-from PyQt5.QtWidgets import (QApplication, QWidget, QHBoxLayout, QVBoxLayout, QGridLayout, QLabel, QMainWindow,
+import os, re, json
+import sqlite3
+from array import array
+from collections import OrderedDict
+from itertools import islice, repeat
+from PyQt5.QtCore import (Qt, QTimer, QEvent, QRect, QRectF, QPropertyAnimation, pyqtSignal, QSize, QPoint, QUrl,
+                          QObject, QFileSystemWatcher, QAbstractListModel, QModelIndex)
+from PyQt5.QtWidgets import (QApplication, QWidget, QHBoxLayout, QVBoxLayout, QLabel, QMainWindow,
                              QSplitter, QScrollArea, QPushButton, QFrame, QSplitterHandle, QSpinBox,
-                             QTextEdit, QLineEdit, QSizePolicy, QGraphicsOpacityEffect, QSizeGrip, QFileDialog)
-from PyQt5.QtGui import QPainter, QColor, QPen, QFont, QFontMetrics, QPixmap, QPainterPath, QRegion, QIcon, QDesktopServices, QTextCursor, QTextCharFormat
+                             QPlainTextEdit, QLineEdit, QSizePolicy, QGraphicsOpacityEffect, QSizeGrip, QFileDialog,
+                             QCheckBox, QComboBox, QListView, QStyledItemDelegate, QListWidget, QListWidgetItem,
+                             QTabBar, QInputDialog, QShortcut)
+from PyQt5.QtGui import (QPainter, QColor, QPen, QFont, QFontMetrics, QPixmap, QPainterPath, QRegion, QIcon, QDesktopServices,
+                         QTextCursor, QKeySequence)
+from layout import read_layout, write_layout
+from marks import MarkList, split_spans, utf16_positions
+from render import compile_cached, render_template, template_issues, iter_render_fields
+from snippets import SnippetGraph, collect_snippets, header_issues, included_names, snippet_name
+from sinks import SINK_KINDS, SinkPipeline, create_sinks
+from table import TableRenderer, read_table
+from search import OutputIndex
+from dedup import SIMILARITY_LEVELS, PromptFilter
+from shadow import SAMPLE_RATES, ShadowCheck
+from changes import NEW, CHANGED, ChangeTracker, changed_only, changed_rows
+from outputs import PagedOutputStore
+from transforms import SlotTransforms
+from tokens import TOKEN_LIMIT, VOCAB_FILE, count_text, iter_token_counts, tokens_available
+from history import RunHistory
+from workspace import Workspace
+from undo import PersistentVector
+from storage import data_dir, session, write_json_atomic
+from watch import WatchSession
+
+
+# Header styles live on the container, so a new field only picks them up instead of parsing its own sheet.
+FIELD_HEADER_STYLE = """
+    QLineEdit#fieldHeader { color: #555; font-size: 10px; border: none; }
+    QLineEdit#fieldHeader[issues="true"] { color: #d9822b; }
+"""
+OUTPUT_CELL_WIDTH = 220
+OUTPUT_CELL_HEIGHT = 120
+VIEW_PAGE_SIZE = 10000
+# Token counts of a Run are kept in an unsigned 16 bit array.
+MAX_TOKEN_COUNT = 0xFFFF
+# The search index lives in memory, so bigger runs and tables are only browsed.
+SEARCH_INDEX_LIMIT = 200000
+INDEX_SLICE = 5000
 
 
 def log_write(msg):
-    with open("session.log", "a") as f:
+    with open(session().log_path, "a") as f:
         f.write(msg + "\n")
 
 
+# Timers that finish the work of a user action carry this name; replay waits for them, but not for others
+# like the "Copied" reset.
+DEBOUNCE_TIMER = "debounce"
+
+
+class FrameCoalescer(QObject):
+    # Runs each scheduled layout pass at most once per frame, however many resize events arrive.
+    def __init__(self, interval_ms=16, parent=None):
+        super().__init__(parent)
+        self.pending = OrderedDict()
+        self.timer = QTimer(self)
+        self.timer.setObjectName(DEBOUNCE_TIMER)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self.flush)
+
+    def schedule(self, callback):
+        self.pending[callback] = None
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def flush(self):
+        pending = self.pending
+        self.pending = OrderedDict()
+        for callback in pending:
+            callback()
+
+
+frame_coalescer = None
+
+
+def schedule_layout_pass(callback):
+    global frame_coalescer
+    if frame_coalescer is None:
+        frame_coalescer = FrameCoalescer(parent=QApplication.instance())
+    frame_coalescer.schedule(callback)
+
+
+class FileWatcher(QObject):
+    refreshed = pyqtSignal(list)
+    failed = pyqtSignal(str)
+
+    def __init__(self, session, debounce_ms=300, parent=None):
+        super().__init__(parent)
+        self.session = session
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self.on_path_changed)
+        self.watcher.directoryChanged.connect(self.on_path_changed)
+        self.debounce_timer = QTimer(self)
+        self.debounce_timer.setSingleShot(True)
+        self.debounce_timer.setInterval(debounce_ms)
+        self.debounce_timer.timeout.connect(self.refresh)
+        self.watch_paths()
+
+    def watch_paths(self):
+        for path in self.session.watched_paths():
+            folder = os.path.dirname(os.path.abspath(path))
+            if folder not in self.watcher.directories():
+                self.watcher.addPath(folder)
+            if os.path.exists(path) and path not in self.watcher.files():
+                self.watcher.addPath(path)
+
+    def on_path_changed(self, path):
+        self.debounce_timer.start()
+
+    def refresh(self):
+        # Editors that save by replacing the file drop it from the watcher, so re-add it.
+        self.watch_paths()
+        try:
+            self.refreshed.emit(self.session.refresh())
+        except (OSError, ValueError, KeyError) as e:
+            self.failed.emit(str(e))
+
+    def stop(self):
+        self.debounce_timer.stop()
+        paths = self.watcher.files() + self.watcher.directories()
+        if paths:
+            self.watcher.removePaths(paths)
+
+
 class TitleBarButton(QPushButton):
     def __init__(self, base_color, hover_icon, parent=None):
         super().__init__(parent)
@@ -132,8 +253,8 @@ class LogLineEdit(QLineEdit):
         self.setCursor(Qt.PointingHandCursor)
     
     def mousePressEvent(self, event):
-        if os.path.exists("session.log"):
-            QDesktopServices.openUrl(QUrl.fromLocalFile("session.log"))
+        if os.path.exists(session().log_path):
+            QDesktopServices.openUrl(QUrl.fromLocalFile(session().log_path))
         else:
             self.setText("Log File not found.")
         super().mousePressEvent(event)
@@ -177,18 +298,50 @@ class CustomSplitter(QSplitter):
 
 
 class TextFieldWithHeader(QWidget):
-    def __init__(self, header_text="Header", parent=None):
+    def __init__(self, snippets, header_text="Header", parent=None):
         super().__init__(parent)
         layout = QVBoxLayout(self)
         layout.setContentsMargins(0, 0, 0, 0)
         layout.setSpacing(2)
         self.header = QLineEdit(header_text)
-        self.header.setStyleSheet("QLineEdit { color: #555; font-size: 10px; border: none; }")
-        self.text_edit = QTextEdit()
+        self.header.setObjectName("fieldHeader")
+        self.text_edit = QPlainTextEdit()
         self.text_edit.setMinimumWidth(200)
         self.text_edit.setSizePolicy(QSizePolicy.MinimumExpanding, QSizePolicy.Preferred)
         layout.addWidget(self.header)
         layout.addWidget(self.text_edit)
+        self.snippets = snippets
+        self.snippet = None
+        self.included = frozenset()
+        self.compiled_text = None
+        self.compiled = None
+        self.issues = []
+
+    def template(self):
+        content = self.text_edit.toPlainText()
+        self.included = included_names(content)
+        content = self.snippets.expand(content)
+        if content != self.compiled_text:
+            self.compiled_text = content
+            self.compiled = compile_cached(content)
+        return self.compiled
+
+    def lint(self, count, used_snippets=frozenset()):
+        self.snippet = snippet_name(self.header.text())
+        compiled = self.template()
+        issues = self.snippets.issues(self.text_edit.toPlainText())
+        if self.snippet is None:
+            issues = template_issues(compiled, count) + header_issues(self.header.text()) + issues
+        elif self.snippet not in used_snippets:
+            issues = [f"Defines {{{{{self.snippet}}}}}, which no field includes, produces no output"] + issues
+        if issues == self.issues:
+            return
+        if bool(issues) != bool(self.issues):
+            self.header.setProperty("issues", bool(issues))
+            self.header.style().unpolish(self.header)
+            self.header.style().polish(self.header)
+        self.issues = issues
+        self.header.setToolTip("\n".join(issues))
 
 
 class ClickableLabel(QLabel):
@@ -197,74 +350,95 @@ class ClickableLabel(QLabel):
         self.clicked.emit()
 
 
-class MarkableTextEdit(QTextEdit):
+class MarkableTextEdit(QPlainTextEdit):
+    # Marks are painted over the visible blocks only, the document itself stays plain text.
+    span_applied = pyqtSignal(str, int, int)
+
     def __init__(self, parent_container, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.parent_container = parent_container
         self.setReadOnly(True)
-        self.setAcceptRichText(True)
-        self.setFrameStyle(QTextEdit.NoFrame)
+        self.setFrameStyle(QFrame.NoFrame)
         self.setAlignment(Qt.AlignHCenter)
 
+    def setAlignment(self, alignment):
+        option = self.document().defaultTextOption()
+        option.setAlignment(alignment)
+        self.document().setDefaultTextOption(option)
+
+    def refresh_highlights(self):
+        self.viewport().update()
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.parent_container.marked_spots:
+            return
+
+        p = QPainter(self.viewport())
+        p.setPen(Qt.NoPen)
+        p.setBrush(QColor(135, 206, 250, 51))
+        offset = self.contentOffset()
+        bottom = event.rect().bottom()
+        block = self.firstVisibleBlock()
+        while block.isValid():
+            block_top = self.blockBoundingGeometry(block).translated(offset)
+            if block_top.top() > bottom:
+                break
+            if block.isVisible():
+                self.paint_block_marks(p, block, block_top.topLeft())
+            block = block.next()
+        p.end()
+
+    def paint_block_marks(self, p, block, origin):
+        block_start = block.position()
+        block_end = block_start + block.length()
+        layout = block.layout()
+        marks = self.parent_container.marked_spots
+        index = marks.first_after(block_start)
+        while index < len(marks) and marks.starts[index] < block_end:
+            start, end = marks.starts[index], marks.ends[index]
+            for line_number in range(layout.lineCount()):
+                line = layout.lineAt(line_number)
+                line_start = block_start + line.textStart()
+                line_end = line_start + line.textLength()
+                if start < line_end and end > line_start:
+                    x1, _ = line.cursorToX(max(start, line_start) - block_start)
+                    x2, _ = line.cursorToX(min(end, line_end) - block_start)
+                    p.drawRect(QRectF(origin.x() + x1, origin.y() + line.y(), x2 - x1, line.height()))
+            index += 1
+
     def mouseReleaseEvent(self, event):
         super().mouseReleaseEvent(event)
         cursor = self.textCursor()
         if not cursor.hasSelection():
             return
-        start = cursor.selectionStart()
-        end = cursor.selectionEnd()
-
-        if self.parent_container.current_mode == "mark":
-            for spot in self.parent_container.marked_spots:
-                existing_start = spot["start"]
-                existing_end = spot["start"] + spot["length"]
-                if start < existing_end and end > existing_start:
-                    return
-            marking_color = QColor(135, 206, 250, 51)
-            new_fmt = QTextCharFormat()
-            new_fmt.setBackground(marking_color)
-            cursor.mergeCharFormat(new_fmt)
-            length = end - start
-            marked_text = cursor.selectedText()
-            self.parent_container.marked_spots.append({
-                "start": start,
-                "length": length,
-                "text": marked_text
-            })
-            self.parent_container.update_marked_counter()
-            cursor.clearSelection()
-            self.setTextCursor(cursor)
-        elif self.parent_container.current_mode == "erase":
-            sel_start = cursor.selectionStart()
-            sel_end = cursor.selectionEnd()
-
-            spots_to_remove = []
-            for spot in self.parent_container.marked_spots:
-                spot_start = spot["start"]
-                spot_end = spot_start + spot["length"]
-                if spot_start < sel_end and spot_end > sel_start:
-                    spots_to_remove.append(spot)
-                    
-            if spots_to_remove:
-                self.parent_container.marked_spots = [
-                    spot for spot in self.parent_container.marked_spots if spot not in spots_to_remove
-                ]
-                full_cursor = QTextCursor(self.document())
-                full_cursor.select(QTextCursor.Document)
-                clear_fmt = QTextCharFormat()
-                clear_fmt.setBackground(Qt.transparent)
-                full_cursor.setCharFormat(clear_fmt)
-                for spot in self.parent_container.marked_spots:
-                    fmt = QTextCharFormat()
-                    fmt.setBackground(QColor(135, 206, 250, 51))
-                    temp_cursor = self.textCursor()
-                    temp_cursor.setPosition(spot["start"])
-                    temp_cursor.setPosition(spot["start"] + spot["length"], QTextCursor.KeepAnchor)
-                    temp_cursor.mergeCharFormat(fmt)
-                self.parent_container.update_marked_counter()
-            
-            cursor.clearSelection()
-            self.setTextCursor(cursor)
+        mode = self.parent_container.current_mode
+        if mode is None:
+            return
+        if not self.apply_span(mode, cursor.selectionStart(), cursor.selectionEnd()) and mode == "mark":
+            return
+        cursor.clearSelection()
+        self.setTextCursor(cursor)
+
+    def apply_span(self, mode, start, end):
+        marks = self.parent_container.marked_spots
+        if mode == "mark":
+            cursor = QTextCursor(self.document())
+            cursor.setPosition(start)
+            cursor.setPosition(end, QTextCursor.KeepAnchor)
+            text = cursor.selectedText()
+            if not marks.add(start, end, text):
+                return False
+            self.window().push_undo(("marks", [], [(start, end, text)]))
+        else:
+            removed = marks.remove_overlapping(start, end)
+            if not removed:
+                return False
+            self.window().push_undo(("marks", removed, []))
+        self.refresh_highlights()
+        self.parent_container.update_marked_counter()
+        self.span_applied.emit(mode, start, end)
+        return True
 
 
 class Part1Container(QWidget):
@@ -273,11 +447,15 @@ class Part1Container(QWidget):
         layout = QVBoxLayout(self)
         layout.setContentsMargins(0, 0, 0, 0)
         layout.setSpacing(1)
-        self.text_edit = QTextEdit()
+        self.text_edit = QPlainTextEdit()
         layout.addWidget(self.text_edit, alignment=Qt.AlignCenter)
     
     def resizeEvent(self, event):
         super().resizeEvent(event)
+        # Qt already batches the layout this triggers; deferring it to the frame pass only showed a stale size.
+        self.resize_text_edit()
+
+    def resize_text_edit(self):
         new_width = int(self.width() * 2/3)
         new_height = int(self.height() * 2/3)
         self.text_edit.setFixedWidth(new_width)
@@ -285,10 +463,12 @@ class Part1Container(QWidget):
 
 
 class Part2Container(QWidget):
+    marks_changed = pyqtSignal()
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.current_mode = None
-        self.marked_spots = []
+        self.marked_spots = MarkList()
         self.overlay_field = None
         self.outer_layout = QVBoxLayout(self)
         self.outer_layout.setContentsMargins(0, 30, 0, 0)
@@ -374,14 +554,67 @@ class Part2Container(QWidget):
 
         self.outer_layout.addLayout(btn_layout)
 
+        auto_layout = QHBoxLayout()
+        auto_layout.setSpacing(10)
+        auto_layout.setAlignment(Qt.AlignCenter)
+
+        self.auto_mode = QComboBox()
+        self.auto_mode.addItems(["Lines", "Delimiter", "Regex"])
+        self.auto_mode.setFixedSize(QSize(100, 30))
+        self.auto_pattern = QLineEdit(",")
+        self.auto_pattern.setFixedSize(QSize(150, 30))
+        self.auto_pattern.setPlaceholderText("Delimiter or regex")
+        self.btn_auto = QPushButton("Auto")
+        self.btn_auto.setFixedSize(btn_size)
+        self.btn_auto.setStyleSheet(mark_erase_normal)
+        self.btn_auto.clicked.connect(self.on_auto_clicked)
+
+        auto_layout.addWidget(self.auto_mode)
+        auto_layout.addWidget(self.auto_pattern)
+        auto_layout.addWidget(self.btn_auto)
+
+        self.outer_layout.addLayout(auto_layout)
+
+        self.transforms = SlotTransforms()
+        self.transforms_error = None
+        self.transforms_field = QLineEdit()
+        self.transforms_field.setFixedSize(QSize(350, 30))
+        self.transforms_field.setPlaceholderText("Transforms, e.g. *: strip; 2: weight=1.2")
+        self.transforms_field.textChanged.connect(self.on_transforms_edited)
+        transforms_layout = QHBoxLayout()
+        transforms_layout.setAlignment(Qt.AlignCenter)
+        transforms_layout.addWidget(self.transforms_field)
+        self.outer_layout.addLayout(transforms_layout)
+
     def resizeEvent(self, event):
         super().resizeEvent(event)
+        # Qt already batches the layout this triggers; deferring it to the frame pass only showed a stale size.
+        self.resize_text_edit()
+
+    def resize_text_edit(self):
         self.text_edit.setFixedWidth(int(self.width() / 2))
         if self.overlay_field:
             self.overlay_field.setGeometry(self.text_edit.geometry())
 
+    def on_transforms_edited(self, spec):
+        try:
+            self.transforms = SlotTransforms(spec)
+        except ValueError as e:
+            self.transforms_error = str(e)
+            self.transforms_field.setStyleSheet("QLineEdit { border: 1px solid #d9822b; }")
+            self.transforms_field.setToolTip(self.transforms_error)
+            return
+        self.transforms_error = None
+        self.transforms_field.setStyleSheet("")
+        self.transforms_field.setToolTip("")
+        self.marks_changed.emit()
+
+    def keywords(self):
+        return self.transforms.apply(self.marked_spots.texts)
+
     def update_marked_counter(self):
         self.marked_counter_label.setText("Marked: " + str(len(self.marked_spots)))
+        self.marks_changed.emit()
 
     def on_mark_toggled(self, checked):
         if checked:
@@ -399,6 +632,27 @@ class Part2Container(QWidget):
             if not self.btn_mark.isChecked():
                 self.current_mode = None
 
+    def on_auto_clicked(self):
+        text = self.text_edit.toPlainText()
+        try:
+            spans = split_spans(text, self.auto_mode.currentText(), self.auto_pattern.text())
+        except re.error as e:
+            self.window().status_icon.setStatus("X")
+            log_write("Auto: Invalid regex: " + str(e))
+            return
+
+        positions = utf16_positions(text, [offset for span in spans for offset in span])
+        # Manual marks take their text from selectedText(), which has U+2029 for line breaks; auto marks match it.
+        added = self.marked_spots.extend(
+            (pos_start, pos_end, text[start:end].replace("\n", "\u2029"))
+            for (start, end), pos_start, pos_end in zip(spans, positions[0::2], positions[1::2])
+        )
+        if added:
+            self.window().push_undo(("marks", [], added))
+        self.text_edit.refresh_highlights()
+        self.update_marked_counter()
+        log_write(f"Auto: Marked {len(added)} keyword(s) by {self.auto_mode.currentText().lower()}.")
+
     def on_clear_clicked(self):
         if self.overlay_field is not None:
             self.overlay_field.deleteLater()
@@ -406,51 +660,29 @@ class Part2Container(QWidget):
             log_write("Clear: Eval overlay removed.")
             return
         
-        cursor = self.text_edit.textCursor()
-        cursor.select(QTextCursor.Document)
-        default_format = QTextCharFormat()
-        default_format.setBackground(Qt.transparent)
-        cursor.setCharFormat(default_format)
-        cursor.clearSelection()
-        self.text_edit.setTextCursor(cursor)
-        self.marked_spots = []
+        cleared = MarkList()
+        self.window().push_undo(("replace_marks", self.marked_spots, cleared))
+        self.marked_spots = cleared
+        self.text_edit.refresh_highlights()
         self.update_marked_counter()
         log_write("Clear: All highlights removed")
 
     def on_eval_clicked(self):
-        proper_eval = (
-            len(self.marked_spots) > 0 and 
-            all(
-                isinstance(spot, dict) and 
-                "start" in spot and 
-                "length" in spot and 
-                "text" in spot and 
-                spot["length"] > 0 and 
-                spot["text"].strip() != ""
-                for spot in self.marked_spots
-            )
-        )
+        # MarkList only holds non-empty, non-overlapping spans in start order, so only the texts need checking.
+        proper_eval = len(self.marked_spots) > 0 and all(text.strip() != "" for text in self.marked_spots.texts)
 
         mw = self.window()
         if proper_eval:
             mw.eval_finished = True
             mw.status_icon.setStatus("check")
-            self.marked_spots.sort(key=lambda spot: spot["start"])
-    
-            data = {"Marks": self.marked_spots}
-    
-            save_folder = "saves"
-            if not os.path.exists(save_folder):
-                os.makedirs(save_folder)
-            json_path = os.path.join(save_folder, "session.json")
-    
-            with open(json_path, "w") as f:
-               json.dump(data, f, indent=4)
-    
-            log_write("Eval: marked_spots sorted and saved to " + json_path)
+            data = {"Marks": self.marked_spots.to_dicts()}
+            json_path = session().json_path
+            write_json_atomic(json_path, data)
+
+            log_write("Eval: marked_spots saved to " + json_path)
 
             if self.overlay_field is None:
-                self.overlay_field = QTextEdit(self.text_edit.parent())
+                self.overlay_field = QPlainTextEdit(self.text_edit.parent())
                 self.overlay_field.setGeometry(self.text_edit.geometry())
                 app_bg = mw.current_bg
                 self.overlay_field.setStyleSheet(
@@ -461,9 +693,7 @@ class Part2Container(QWidget):
                 self.overlay_field.setReadOnly(True)
                 self.overlay_field.setFocusPolicy(Qt.NoFocus)
 
-            overlay_text = ""
-            for i, spot in enumerate(self.marked_spots, start=1):
-                overlay_text += f"{i}- {spot['text']}\n"
+            overlay_text = "\n".join(f"{i}- {text}" for i, text in enumerate(self.marked_spots.texts, start=1))
             self.overlay_field.setPlainText(overlay_text.strip())
             self.overlay_field.show()
             self.overlay_field.raise_()
@@ -474,26 +704,103 @@ class Part2Container(QWidget):
 
     def update_text(self, new_text):
         self.text_edit.setPlainText(new_text)
-        self.marked_spots = []
+        self.marked_spots = MarkList()
+        self.text_edit.refresh_highlights()
         self.update_marked_counter()
 
 
 class Part3Container(QWidget):
+    field_added = pyqtSignal(object)
+    snippets_changed = pyqtSignal(object)
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.fields = []
         self.spacing = 10
+        self.layout_key = None
+        self.slot_count = 0
+        self.used_snippets = frozenset()
+        self.snippets = SnippetGraph()
+        self.snippets_stale = False
+        # Edited fields are linted in one batch once typing pauses, the rest keep their last result.
+        self.dirty_fields = set()
+        self.lint_timer = QTimer(self)
+        self.lint_timer.setObjectName(DEBOUNCE_TIMER)
+        self.lint_timer.setSingleShot(True)
+        self.lint_timer.timeout.connect(self.lint_dirty_fields)
+        self.rest_timer = QTimer(self)
+        self.rest_timer.setObjectName(DEBOUNCE_TIMER)
+        self.rest_timer.setSingleShot(True)
+        self.rest_timer.timeout.connect(self.relayout_fields)
+        self.set_field_style("")
 
         for _ in range(4):
             self.add_field()
 
+    def set_field_style(self, style):
+        # One sheet for every field, fields added later inherit it without a sheet of their own.
+        style = FIELD_HEADER_STYLE + style
+        if style != self.styleSheet():
+            self.setStyleSheet(style)
+
     def add_field(self):
-        field = TextFieldWithHeader()
+        field = TextFieldWithHeader(self.snippets)
         field.setMinimumWidth(200)
         field.setFixedHeight(250)
         self.fields.append(field)
         field.setParent(self)
         field.show()
+        field.text_edit.textChanged.connect(lambda: self.mark_dirty(field))
+        field.header.textChanged.connect(lambda: self.mark_dirty(field))
+        # Linted with the next batch, so a field filled right away, e.g. from a layout, is linted once.
+        self.mark_dirty(field)
+        self.field_added.emit(field)
+
+    def mark_dirty(self, field):
+        self.dirty_fields.add(field)
+        self.lint_timer.start(150)
+
+    def lint_dirty_fields(self):
+        self.lint_timer.stop()
+        if self.snippets_stale or any(
+                field.snippet is not None or snippet_name(field.header.text()) is not None for field in self.dirty_fields):
+            self.update_snippets()
+        for field in self.dirty_fields:
+            field.lint(self.slot_count, self.used_snippets)
+        self.dirty_fields.clear()
+        self.update_used_snippets()
+
+    def update_used_snippets(self):
+        # Snippets nobody includes are flagged, e.g. an old field whose header happens to start with "@".
+        used = frozenset().union(*(field.included for field in self.fields))
+        if used != self.used_snippets:
+            self.used_snippets = used
+            for field in self.fields:
+                if field.snippet is not None:
+                    field.lint(self.slot_count, used)
+
+    def update_snippets(self):
+        self.snippets_stale = False
+        affected = self.snippets.update(
+            collect_snippets((field.header.text(), field.text_edit.toPlainText()) for field in self.fields))
+        if affected:
+            # Only templates that include a changed snippet, directly or through another one, are linted again.
+            users = [field for field in self.fields if not field.included.isdisjoint(affected)]
+            self.dirty_fields.update(users)
+            self.snippets_changed.emit(users)
+
+    def expanded_fields(self):
+        self.lint_dirty_fields()
+        return self.snippets.expand_fields(
+            [(field.header.text(), field.text_edit.toPlainText()) for field in self.fields])
+
+    def set_slot_count(self, count):
+        if count == self.slot_count:
+            return
+        self.slot_count = count
+        for field in self.fields:
+            field.lint(count, self.used_snippets)
+        self.dirty_fields.clear()
 
     def update_field_count(self, count):
         current_count = len(self.fields)
@@ -503,21 +810,41 @@ class Part3Container(QWidget):
         elif count < current_count:
             for _ in range(current_count - count):
                 field = self.fields.pop()
+                self.dirty_fields.discard(field)
+                if field.snippet is not None:
+                    self.snippets_stale = True
+                    self.lint_timer.start(150)
                 field.setParent(None)
                 field.deleteLater()
         self.relayout_fields()
 
     def resizeEvent(self, event):
         super().resizeEvent(event)
-        self.relayout_fields()
-
-    def relayout_fields(self):
+        schedule_layout_pass(self.relayout_visible_fields)
+
+    def moveEvent(self, event):
+        # Scrolling moves the container, rows left for later have to be in place before they scroll in.
+        super().moveEvent(event)
+        if self.rest_timer.isActive():
+            self.rest_timer.stop()
+            self.relayout_fields()
+
+    def relayout_visible_fields(self):
+        # While a resize drag goes on only the rows on screen follow it, the others catch up once it pauses.
+        visible = self.visibleRegion().boundingRect()
+        if not self.relayout_fields(visible.top(), visible.bottom()):
+            self.rest_timer.start(150)
+
+    def relayout_fields(self, top=None, bottom=None):
         total = len(self.fields)
         if total == 0:
-            return
+            return True
 
         spacing = self.spacing
         container_width = self.width()
+        # Field geometry only depends on the width, so height-only resizes skip the pass.
+        if self.layout_key == (container_width, total):
+            return True
 
         full_columns = 6
         rows = (total + full_columns - 1) // full_columns
@@ -525,7 +852,14 @@ class Part3Container(QWidget):
         total_height = rows * 250 + (rows - 1) * spacing
         self.setMinimumHeight(int(total_height))
 
-        for row in range(rows):
+        first_row, last_row = 0, rows - 1
+        if top is not None:
+            first_row = max(0, top // (250 + spacing))
+            last_row = min(rows - 1, bottom // (250 + spacing))
+        placed_all = first_row == 0 and last_row == rows - 1
+        self.layout_key = (container_width, total) if placed_all else None
+
+        for row in range(first_row, last_row + 1):
             start_index = row * full_columns
             count_in_row = total - start_index if row == rows - 1 else full_columns
             cell_width = (container_width - (count_in_row - 1) * spacing) / count_in_row if count_in_row > 0 else container_width
@@ -534,6 +868,73 @@ class Part3Container(QWidget):
                 index = start_index + i
                 x = i * (cell_width + spacing)
                 self.fields[index].setGeometry(int(x), int(y), int(cell_width), 250)
+        return placed_all
+
+
+class PreviewPane(QWidget):
+    def __init__(self, part2_container, parent=None):
+        super().__init__(parent)
+        self.part2_container = part2_container
+        self.field = None
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 5, 0, 0)
+        layout.setSpacing(2)
+        self.header_label = QLabel("Preview")
+        self.header_label.setStyleSheet("QLabel { color: #989898; font-size: 10px; }")
+        layout.addWidget(self.header_label)
+        self.text_edit = QPlainTextEdit()
+        self.text_edit.setReadOnly(True)
+        self.text_edit.setPlaceholderText("Focus a field to preview its output")
+        layout.addWidget(self.text_edit)
+
+        self.render_timer = QTimer(self)
+        self.render_timer.setObjectName(DEBOUNCE_TIMER)
+        self.render_timer.setSingleShot(True)
+        self.render_timer.timeout.connect(self.render_preview)
+        part2_container.marks_changed.connect(self.on_marks_changed)
+
+    def set_field(self, field):
+        if field is self.field:
+            return
+        if self.field is not None:
+            self.field.text_edit.textChanged.disconnect(self.schedule_render)
+            self.field.header.textChanged.disconnect(self.schedule_render)
+            self.field.destroyed.disconnect(self.on_field_destroyed)
+        self.field = field
+        field.text_edit.textChanged.connect(self.schedule_render)
+        field.header.textChanged.connect(self.schedule_render)
+        field.destroyed.connect(self.on_field_destroyed)
+        self.render_preview()
+
+    def on_field_destroyed(self):
+        self.field = None
+        self.render_timer.stop()
+        self.header_label.setText("Preview")
+        self.text_edit.clear()
+        self.text_edit.setPlaceholderText("Focus a field to preview its output")
+
+    def on_marks_changed(self):
+        if self.field is not None:
+            self.schedule_render()
+
+    def on_snippets_changed(self, fields):
+        if self.field in fields:
+            self.schedule_render()
+
+    def schedule_render(self):
+        self.render_timer.start(100)
+
+    def render_preview(self):
+        if self.field is None:
+            return
+        # Only the focused field is compiled and rendered, so the cost does not grow with the field count.
+        compiled = self.field.template()
+        self.header_label.setText("Preview: " + self.field.header.text())
+        if not compiled.segments:
+            self.text_edit.setPlainText("")
+            self.text_edit.setPlaceholderText("Empty fields are skipped on Run")
+        else:
+            self.text_edit.setPlainText(render_template(compiled, self.part2_container.keywords()))
 
 
 class OutputOverlay(QWidget):
@@ -550,93 +951,377 @@ class OutputOverlay(QWidget):
         event.accept()
 
 
+class OutputListModel(QAbstractListModel):
+    TextRole = Qt.UserRole + 1
+    TokenRole = Qt.UserRole + 2
+    StateRole = Qt.UserRole + 3
+
+    def __init__(self, outputs, token_counts=None, states=None, parent=None):
+        super().__init__(parent)
+        self.outputs = outputs
+        self.token_counts = token_counts
+        self.states = states
+        self.rows = None
+        self.first = 0
+
+    def total(self):
+        return len(self.outputs) if self.rows is None else len(self.rows)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        # The view only holds one page of rows, its layout grows with the row count and has to stay small.
+        return max(0, min(VIEW_PAGE_SIZE, self.total() - self.first))
+
+    def source_row(self, row):
+        row += self.first
+        return row if self.rows is None else self.rows[row]
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            return self.outputs[self.source_row(index.row())][0]
+        if role == self.TextRole:
+            return self.outputs[self.source_row(index.row())][1]
+        if role == self.TokenRole:
+            row = self.source_row(index.row())
+            # Outputs that were not rendered in this session, e.g. from history, are counted when first painted.
+            if self.token_counts is None:
+                if not tokens_available():
+                    return None
+                return count_text(self.outputs[row][1])
+            return self.token_counts[row]
+        if role == self.StateRole:
+            if self.states is None:
+                return None
+            return self.states[self.source_row(index.row())]
+        return None
+
+    def set_rows(self, rows):
+        self.beginResetModel()
+        self.rows = rows
+        self.first = 0
+        self.endResetModel()
+
+    def set_first(self, first):
+        self.beginResetModel()
+        self.first = first
+        self.endResetModel()
+
+    def set_outputs(self, outputs, token_counts=None, states=None):
+        self.beginResetModel()
+        self.outputs = outputs
+        self.token_counts = token_counts
+        self.states = states
+        self.rows = None
+        self.first = 0
+        self.endResetModel()
+
+
+class OutputDelegate(QStyledItemDelegate):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.copied_row = None
+        self.header_font = QFont()
+        self.header_font.setPixelSize(10)
+        self.header_font.setBold(True)
+        self.text_font = QFont()
+        self.text_font.setPixelSize(10)
+
+    def sizeHint(self, option, index):
+        return QSize(OUTPUT_CELL_WIDTH, OUTPUT_CELL_HEIGHT)
+
+    def paint(self, p, option, index):
+        p.save()
+        p.setRenderHint(QPainter.Antialiasing)
+        rect = QRectF(option.rect).adjusted(5, 5, -5, -5)
+        p.setPen(QPen(QColor("#ccc"), 2))
+        p.setBrush(QColor("#666"))
+        p.drawRoundedRect(rect, 8, 8)
+
+        inner = rect.adjusted(7, 5, -7, -5).toRect()
+        header_metrics = QFontMetrics(self.header_font)
+        header_rect = QRect(inner.x(), inner.y(), inner.width(), header_metrics.height())
+        tokens = index.data(OutputListModel.TokenRole)
+        p.setFont(self.header_font)
+        token_width = 0
+        if tokens is not None:
+            over_limit = tokens > TOKEN_LIMIT
+            token_text = f"{tokens}/{TOKEN_LIMIT}" if over_limit else str(tokens)
+            p.setPen(QColor("#ff6b6b") if over_limit else QColor("#989898"))
+            p.drawText(header_rect, Qt.AlignRight | Qt.AlignVCenter, token_text)
+            token_width = header_metrics.horizontalAdvance(token_text) + 6
+        state = index.data(OutputListModel.StateRole)
+        if state == NEW or state == CHANGED:
+            # Unchanged outputs stay unmarked, so the few that need regenerating stand out.
+            state_text = "NEW" if state == NEW else "CHANGED"
+            p.setPen(QColor("#6bcb77") if state == NEW else QColor("#ffb347"))
+            p.drawText(header_rect.adjusted(0, 0, -token_width, 0), Qt.AlignRight | Qt.AlignVCenter, state_text)
+            token_width += header_metrics.horizontalAdvance(state_text) + 6
+        header = header_metrics.elidedText(index.data(Qt.DisplayRole), Qt.ElideRight, inner.width() - token_width)
+        p.setPen(QColor("#E0E0E0"))
+        p.drawText(header_rect, Qt.AlignLeft | Qt.AlignVCenter, header)
+        p.setFont(self.text_font)
+        p.drawText(inner.adjusted(0, header_metrics.height() + 2, 0, 0), Qt.AlignLeft | Qt.AlignTop | Qt.TextWordWrap,
+                   index.data(OutputListModel.TextRole))
+
+        if index.row() == self.copied_row:
+            badge = QRectF(0, 0, 56, 20)
+            badge.moveCenter(rect.center())
+            p.setPen(QPen(Qt.white, 1))
+            p.setBrush(Qt.black)
+            p.drawRoundedRect(badge, 5, 5)
+            p.drawText(badge, Qt.AlignCenter, "Copied")
+        p.restore()
+
+
+class OutputView(QListView):
+    def __init__(self, model, parent=None):
+        super().__init__(parent)
+        self.setModel(model)
+        self.output_delegate = OutputDelegate(self)
+        self.setItemDelegate(self.output_delegate)
+        self.setViewMode(QListView.IconMode)
+        self.setMovement(QListView.Static)
+        self.setResizeMode(QListView.Adjust)
+        self.setUniformItemSizes(True)
+        self.setLayoutMode(QListView.Batched)
+        self.setGridSize(QSize(OUTPUT_CELL_WIDTH, OUTPUT_CELL_HEIGHT))
+        self.setSelectionMode(QListView.NoSelection)
+        self.setStyleSheet("QListView { background: transparent; border: none; }")
+        self.copied_timer = QTimer(self)
+        self.copied_timer.setSingleShot(True)
+        self.copied_timer.timeout.connect(self.hide_copied_indicator)
+        self.clicked.connect(self.copy_content)
+        model.modelReset.connect(self.hide_copied_indicator)
+
+    def copy_content(self, index):
+        clipboard = QApplication.clipboard()
+        clipboard.setText(index.data(OutputListModel.TextRole))
+        self.output_delegate.copied_row = index.row()
+        self.viewport().update()
+        self.copied_timer.start(3000)
+
+    def hide_copied_indicator(self):
+        self.output_delegate.copied_row = None
+        self.viewport().update()
+
+
 class OutputWindow(QFrame):
-    def __init__(self, outputs, parent=None):
+    def __init__(self, outputs, index=None, token_counts=None, changes=None, parent=None):
         super().__init__(parent)
         self.setStyleSheet("QFrame { background-color: #2d2d2d; border: 2px solid #aaa; border-radius: 8px; color: #ddd; }")
+        self.index = index
+        self.changes = changes
+        # Outputs without an index, e.g. a table or a run from history, are indexed a slice per timer tick.
+        self.pending_index = None
+        self.pending_rows = None
+        self.index_timer = QTimer(self)
+        self.index_timer.setObjectName(DEBOUNCE_TIMER)
+        self.index_timer.setSingleShot(True)
+        self.index_timer.setInterval(0)
+        self.index_timer.timeout.connect(self.index_slice)
         main_layout = QVBoxLayout(self)
         main_layout.setContentsMargins(10, 10, 10, 10)
         main_layout.setSpacing(5)
-        
+
         top_layout = QHBoxLayout()
         self.back_button = QPushButton("←", self)
         self.back_button.setFixedSize(30, 30)
         self.back_button.setStyleSheet("QPushButton { background-color: transparent; color: #ddd; border: none; }")
         top_layout.addWidget(self.back_button, alignment=Qt.AlignLeft)
         top_layout.addStretch()
+        self.count_label = QLabel(self)
+        self.count_label.setStyleSheet("QLabel { border: none; color: #989898; }")
+        top_layout.addWidget(self.count_label)
+        self.previous_page_button = QPushButton("‹", self)
+        self.next_page_button = QPushButton("›", self)
+        self.page_label = QLabel(self)
+        self.page_label.setStyleSheet("QLabel { border: none; color: #989898; }")
+        for widget in (self.previous_page_button, self.page_label, self.next_page_button):
+            if widget is not self.page_label:
+                widget.setFixedSize(24, 24)
+                widget.setStyleSheet("QPushButton { background-color: transparent; color: #ddd; border: none; }")
+            top_layout.addWidget(widget)
+        self.previous_page_button.clicked.connect(lambda: self.show_page(self.model.first // VIEW_PAGE_SIZE - 1))
+        self.next_page_button.clicked.connect(lambda: self.show_page(self.model.first // VIEW_PAGE_SIZE + 1))
+        self.changed_checkbox = QCheckBox("Changed only", self)
+        self.changed_checkbox.setStyleSheet("QCheckBox { border: none; color: #ddd; }")
+        self.changed_checkbox.toggled.connect(self.filter_outputs)
+        top_layout.addWidget(self.changed_checkbox)
+        self.copy_changed_button = QPushButton("Copy Changed", self)
+        self.copy_changed_button.setStyleSheet("QPushButton { background: #444; border: 1px solid #555; border-radius: 4px; color: #ddd; padding: 2px 6px; }")
+        self.copy_changed_button.clicked.connect(self.copy_changed)
+        top_layout.addWidget(self.copy_changed_button)
+        self.export_changed_button = QPushButton("Export Changed", self)
+        self.export_changed_button.setStyleSheet("QPushButton { background: #444; border: 1px solid #555; border-radius: 4px; color: #ddd; padding: 2px 6px; }")
+        top_layout.addWidget(self.export_changed_button)
+        self.search_field = QLineEdit(self)
+        self.search_field.setPlaceholderText("Search headers and prompts")
+        self.search_field.setFixedWidth(250)
+        self.search_field.setStyleSheet("QLineEdit { background: #444; border: 1px solid #555; border-radius: 4px; color: #ddd; }")
+        self.search_field.textChanged.connect(self.filter_outputs)
+        top_layout.addWidget(self.search_field)
         main_layout.addLayout(top_layout)
-        
-        self.grid_layout = QGridLayout()
-        self.grid_layout.setSpacing(10)
-        self.grid_layout.setContentsMargins(0, 0, 0, 0)
-        main_layout.addLayout(self.grid_layout)
-        
-        self.populate_outputs(outputs)
-        self.adjustSize()
-    
-    def populate_outputs(self, outputs):
-        max_columns = 6
-        for index, (header_text, content_text) in enumerate(outputs):
-            row = index // max_columns
-            col = index % max_columns
-            field = OutputField(header_text, content_text, parent=self)
-            self.grid_layout.addWidget(field, row, col)
+
+        self.model = OutputListModel(outputs, token_counts, changes.states if changes else None, self)
+        self.view = OutputView(self.model, self)
+        main_layout.addWidget(self.view)
+        self.update_search_field()
+        self.update_change_controls()
+        self.update_count_label()
+        self.update_pager()
+
+    def set_outputs(self, outputs, index=None, token_counts=None, changes=None):
+        self.index = index
+        self.changes = changes
+        self.index_timer.stop()
+        self.pending_index = None
+        self.pending_rows = None
+        self.search_field.blockSignals(True)
+        self.search_field.clear()
+        self.search_field.blockSignals(False)
+        self.changed_checkbox.blockSignals(True)
+        self.changed_checkbox.setChecked(False)
+        self.changed_checkbox.blockSignals(False)
+        self.model.set_outputs(outputs, token_counts, changes.states if changes else None)
+        self.view.scrollToTop()
+        self.update_search_field()
+        self.update_change_controls()
+        self.update_count_label()
+        self.update_pager()
+
+    def update_change_controls(self):
+        # Outputs opened from history were not compared to a previous run, so there is nothing to filter by.
+        for widget in (self.changed_checkbox, self.copy_changed_button, self.export_changed_button):
+            widget.setVisible(self.changes is not None)
+
+    def update_search_field(self):
+        searchable = self.index is not None or len(self.model.outputs) <= SEARCH_INDEX_LIMIT
+        self.search_field.setEnabled(searchable)
+        self.search_field.setPlaceholderText(
+            "Search headers and prompts" if searchable else f"Search is off above {SEARCH_INDEX_LIMIT} outputs")
+
+    def index_slice(self):
+        for header, text in islice(self.pending_rows, INDEX_SLICE):
+            self.pending_index.add(header, text)
+        if self.pending_index.count < len(self.model.outputs):
+            self.update_count_label()
+            self.index_timer.start()
+            return
+        self.index = self.pending_index
+        self.pending_index = None
+        self.pending_rows = None
+        self.filter_outputs()
+
+    def filter_outputs(self):
+        query = self.search_field.text()
+        rows = None
+        if query and self.index is None:
+            # The query is applied once the index is complete, the view stays unfiltered until then.
+            if self.pending_index is None:
+                self.pending_index = OutputIndex()
+                self.pending_rows = iter(self.model.outputs)
+                self.index_timer.start()
+            self.update_count_label()
+            return
+        if query:
+            rows = self.index.search(query)
+        if self.changes is not None and self.changed_checkbox.isChecked():
+            rows = changed_rows(self.changes.states, rows)
+        self.model.set_rows(rows)
+        self.update_count_label()
+        self.update_pager()
+
+    def page_count(self):
+        return max(1, (self.model.total() + VIEW_PAGE_SIZE - 1) // VIEW_PAGE_SIZE)
+
+    def show_page(self, page):
+        page = max(0, min(page, self.page_count() - 1))
+        self.model.set_first(page * VIEW_PAGE_SIZE)
+        self.view.scrollToTop()
+        self.update_pager()
+
+    def update_pager(self):
+        pages = self.page_count()
+        page = self.model.first // VIEW_PAGE_SIZE
+        for widget in (self.previous_page_button, self.page_label, self.next_page_button):
+            widget.setVisible(pages > 1)
+        self.page_label.setText(f"Page {page + 1} / {pages}")
+        self.previous_page_button.setEnabled(page > 0)
+        self.next_page_button.setEnabled(page < pages - 1)
+
+    def changed_outputs(self):
+        return changed_only(self.model.outputs, self.changes.states)
+
+    def copy_changed(self):
+        texts = [text for _, text in self.changed_outputs()]
+        QApplication.clipboard().setText("\n\n".join(texts))
+        log_write(f"Output: Copied {len(texts)} new or changed output(s).")
+
+    def update_count_label(self):
+        text = f"{self.model.total()} / {len(self.model.outputs)}"
+        if self.pending_index is not None:
+            text = f"Indexing {self.pending_index.count} / {len(self.model.outputs)}"
+        tooltip = ""
+        if self.changes is not None:
+            text += "   " + self.changes.summary()
+            removed = self.changes.removed()
+            if removed:
+                tooltip = "Removed since the previous run:\n" + "\n".join(
+                    header if count == 1 else f"{header} ({count}x)" for header, count in removed[:50])
+        self.count_label.setText(text)
+        self.count_label.setToolTip(tooltip)
+
+    def sizeHint(self):
+        count = max(1, len(self.model.outputs))
+        columns = min(6, count)
+        rows = (count + columns - 1) // columns
+        return QSize(columns * OUTPUT_CELL_WIDTH + 40, rows * OUTPUT_CELL_HEIGHT + 65)
 
 
-class OutputField(QFrame):
-    def __init__(self, header_text="Header", content_text="Content", parent=None):
+class HistoryWindow(QFrame):
+    run_opened = pyqtSignal(int)
+
+    def __init__(self, history, parent=None):
         super().__init__(parent)
-        self.setStyleSheet("QFrame { background-color: #666; border: 2px solid #ccc; border-radius: 8px; color: #ddd; }")
-        self.setMinimumSize(130, 65)
-        self.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
-        layout = QVBoxLayout(self)
-        layout.setContentsMargins(5, 5, 5, 5)
-        layout.setSpacing(2)
-        
-        self.header = QLineEdit(header_text, self)
-        self.header.setReadOnly(True)
-        self.header.setStyleSheet("QLineEdit { background: transparent; border: none; font: bold 10px; color: #E0E0E0; }")
-        layout.addWidget(self.header)
-        
-        self.text_edit = QTextEdit(self)
-        self.text_edit.setReadOnly(True)
-        self.text_edit.setStyleSheet("QTextEdit { background: transparent; border: none; font-size: 10px; color: #E0E0E0; }")
-        self.text_edit.setPlainText(content_text)
-        layout.addWidget(self.text_edit)
-        
-        self.copied_label = QLabel("Copied", self)
-        self.copied_label.setStyleSheet(
-            "background-color: black; border: 1px solid white; border-radius: 5px; color: white; padding: 2px;"
-        )
-        self.copied_label.setAlignment(Qt.AlignCenter)
-        self.copied_label.hide()
-        
-        self.header.installEventFilter(self)
-        self.text_edit.installEventFilter(self)
-        self.text_edit.viewport().installEventFilter(self)
-    
-    def eventFilter(self, obj, event):
-        if event.type() == QEvent.MouseButtonPress:
-            self.copyContent()
-            return True
-        return super().eventFilter(obj, event)
-    
-    def mousePressEvent(self, event):
-        self.copyContent()
-        event.accept()
-    
-    def copyContent(self):
-        clipboard = QApplication.clipboard()
-        clipboard.setText(self.text_edit.toPlainText())
-        self.showCopiedIndicator()
-    
-    def showCopiedIndicator(self):
-        self.copied_label.show()
-        self.copied_label.adjustSize()
-        x = (self.width() - self.copied_label.width()) // 2
-        y = (self.height() - self.copied_label.height()) // 2
-        self.copied_label.move(x, y)
-        QTimer.singleShot(3000, self.copied_label.hide)
+        self.setStyleSheet("QFrame { background-color: #2d2d2d; border: 2px solid #aaa; border-radius: 8px; color: #ddd; }")
+        self.history = history
+        main_layout = QVBoxLayout(self)
+        main_layout.setContentsMargins(10, 10, 10, 10)
+        main_layout.setSpacing(5)
+
+        top_layout = QHBoxLayout()
+        self.back_button = QPushButton("←", self)
+        self.back_button.setFixedSize(30, 30)
+        self.back_button.setStyleSheet("QPushButton { background-color: transparent; color: #ddd; border: none; }")
+        top_layout.addWidget(self.back_button, alignment=Qt.AlignLeft)
+        top_layout.addStretch()
+        self.search_field = QLineEdit(self)
+        self.search_field.setPlaceholderText("Header, keyword or YYYY-MM-DD")
+        self.search_field.setFixedWidth(250)
+        self.search_field.setStyleSheet("QLineEdit { background: #444; border: 1px solid #555; border-radius: 4px; color: #ddd; }")
+        self.search_field.textChanged.connect(self.load_runs)
+        top_layout.addWidget(self.search_field)
+        main_layout.addLayout(top_layout)
+
+        self.run_list = QListWidget(self)
+        self.run_list.setStyleSheet("QListWidget { background: transparent; border: none; font-size: 12px; }")
+        self.run_list.itemDoubleClicked.connect(lambda item: self.run_opened.emit(item.data(Qt.UserRole)))
+        main_layout.addWidget(self.run_list)
+        self.load_runs("")
+
+    def load_runs(self, text):
+        self.run_list.clear()
+        for run_id, started, duration, output_count, keywords in self.history.search_runs(text):
+            when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(started))
+            item = QListWidgetItem(f"#{run_id}   {when}   {output_count} output(s)   {duration:.2f}s   {', '.join(keywords)}")
+            item.setData(Qt.UserRole, run_id)
+            self.run_list.addItem(item)
+
+    def sizeHint(self):
+        return QSize(900, 500)
 
 
 class StatusIcon(QLabel):
@@ -713,6 +1398,53 @@ class SettingsMenu(QFrame):
         self.import_button.setStyleSheet("padding: 8px; border-radius: 0px; background-color: #444; color: #ddd;")
         self.import_button.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Preferred)
         layout.addWidget(self.import_button)
+
+        self.history_button = QPushButton("Run History")
+        self.history_button.setStyleSheet("padding: 8px; border-radius: 0px; background-color: #444; color: #ddd;")
+        self.history_button.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Preferred)
+        layout.addWidget(self.history_button)
+
+        self.watch_button = QPushButton("Watch Files")
+        self.watch_button.setStyleSheet("padding: 8px; border-radius: 0px; background-color: #444; color: #ddd;")
+        self.watch_button.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Preferred)
+        layout.addWidget(self.watch_button)
+
+        self.table_button = QPushButton("Run Table")
+        self.table_button.setStyleSheet("padding: 8px; border-radius: 0px; background-color: #444; color: #ddd;")
+        self.table_button.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Preferred)
+        layout.addWidget(self.table_button)
+        self.table_header_checkbox = QCheckBox("Table has header row")
+        layout.addWidget(self.table_header_checkbox)
+
+        layout.addSpacing(15)
+        self.sinks_label = QLabel("Write Outputs To:")
+        layout.addWidget(self.sinks_label)
+        sinks_layout = QHBoxLayout()
+        self.sink_checkboxes = {}
+        for kind in SINK_KINDS:
+            checkbox = QCheckBox(kind)
+            sinks_layout.addWidget(checkbox)
+            self.sink_checkboxes[kind] = checkbox
+        layout.addLayout(sinks_layout)
+        dedup_layout = QHBoxLayout()
+        self.dedup_checkbox = QCheckBox("Drop duplicates")
+        dedup_layout.addWidget(self.dedup_checkbox)
+        self.dedup_similarity = QComboBox()
+        self.dedup_similarity.addItems([label for label, _ in SIMILARITY_LEVELS])
+        dedup_layout.addWidget(self.dedup_similarity)
+        layout.addLayout(dedup_layout)
+        shadow_layout = QHBoxLayout()
+        self.shadow_label = QLabel("Shadow check:")
+        shadow_layout.addWidget(self.shadow_label)
+        self.shadow_rate = QComboBox()
+        self.shadow_rate.addItems([label for label, _ in SAMPLE_RATES])
+        shadow_layout.addWidget(self.shadow_rate)
+        layout.addLayout(shadow_layout)
+
+        self.sink_folder_button = QPushButton("Output Folder")
+        self.sink_folder_button.setStyleSheet("padding: 8px; border-radius: 0px; background-color: #444; color: #ddd;")
+        self.sink_folder_button.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Preferred)
+        layout.addWidget(self.sink_folder_button)
         
         layout.addSpacing(15)
         output_layout = QHBoxLayout()
@@ -769,25 +1501,46 @@ class SettingsMenu(QFrame):
         self.effect = QGraphicsOpacityEffect(self)
         self.setGraphicsEffect(self.effect)
         self.effect.setOpacity(0)
+        self.anim = QPropertyAnimation(self.effect, b"opacity", self)
+        self.anim.setDuration(200)
+        self.anim.finished.connect(self.on_fade_finished)
 
     def fade_in(self):
         self.show()
-        self.anim = QPropertyAnimation(self.effect, b"opacity")
-        self.anim.setDuration(200)
+        self.anim.stop()
         self.anim.setStartValue(0)
         self.anim.setEndValue(1)
         self.anim.start()
 
     def hide_with_fade(self):
-        self.anim = QPropertyAnimation(self.effect, b"opacity")
-        self.anim.setDuration(200)
+        self.anim.stop()
         self.anim.setStartValue(self.effect.opacity())
         self.anim.setEndValue(0)
-        self.anim.finished.connect(self.hide)
         self.anim.start()
 
+    def on_fade_finished(self):
+        if self.anim.endValue() == 0:
+            self.hide()
+
+    def prompt_filter(self):
+        if not self.dedup_checkbox.isChecked():
+            return None
+        return PromptFilter(SIMILARITY_LEVELS[self.dedup_similarity.currentIndex()][1])
+
+    def shadow_check(self, fields, transforms):
+        rate = SAMPLE_RATES[self.shadow_rate.currentIndex()][1]
+        if rate <= 0:
+            return None
+        return ShadowCheck(fields, transforms, rate)
+
+    def selected_sinks(self):
+        return [kind for kind, checkbox in self.sink_checkboxes.items() if checkbox.isChecked()]
+
 
 class MainWindow(QMainWindow):
+    layout_applied = pyqtSignal(list)
+    workspace_closed = pyqtSignal(int)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("RapidPrompt")
@@ -805,10 +1558,43 @@ class MainWindow(QMainWindow):
         self.current_bg = self.dark_bg
         self.current_text = self.dark_text
         self.eval_finished = False
+        self.file_watcher = None
+        self.history = None
+        self.output_overlay = None
+        self.history_overlay = None
+        self.history_window = None
+        self.output_window = None
+        self.token_counts = None
+        self.fingerprint = None
+        self.output_changes = None
+        self.shadow_checks = []
+        self.output_store_count = 0
+        self.shadow_timer = QTimer(self)
+        self.shadow_timer.setObjectName(DEBOUNCE_TIMER)
+        self.shadow_timer.setSingleShot(True)
+        self.shadow_timer.setInterval(0)
+        self.shadow_timer.timeout.connect(self.check_shadow_samples)
+        self.loading = False
+        self.workspaces = [Workspace("Workspace 1")]
+        self.active_workspace = self.workspaces[0]
+        self.sink_dir = os.path.join(data_dir(), "outputs")
         self.timer = None
         self.initial_reset_done = False
+        self.mask_cache = OrderedDict()
         self.installEventFilter(self)
         self.init_ui()
+        self.fields_state = PersistentVector.from_list(self.current_fields())
+        self.edited_fields = set()
+        self.undo_timer = QTimer(self)
+        self.undo_timer.setObjectName(DEBOUNCE_TIMER)
+        self.undo_timer.setSingleShot(True)
+        self.undo_timer.timeout.connect(self.commit_field_edits)
+        for field in self.part3_container.fields:
+            self.watch_field_edits(field)
+        self.part3_container.field_added.connect(self.watch_field_edits)
+        QShortcut(QKeySequence("Ctrl+Z"), self, self.undo)
+        QShortcut(QKeySequence("Ctrl+Y"), self, self.redo)
+        QShortcut(QKeySequence("Ctrl+Shift+Z"), self, self.redo)
         self.initialize_session_files()
         self.update_stylesheet(self.current_bg, self.current_text)
 
@@ -822,6 +1608,10 @@ class MainWindow(QMainWindow):
         self.settings_menu.output_spin_box.valueChanged.connect(self.update_part3_fields)
         self.settings_menu.export_button.clicked.connect(self.export_layout)
         self.settings_menu.import_button.clicked.connect(self.import_layout)
+        self.settings_menu.watch_button.clicked.connect(self.toggle_watch)
+        self.settings_menu.history_button.clicked.connect(self.show_history_window)
+        self.settings_menu.sink_folder_button.clicked.connect(self.choose_sink_folder)
+        self.settings_menu.table_button.clicked.connect(self.run_table)
         self.run_button.clicked.connect(self.on_run_button_clicked)
 
     def init_ui(self):
@@ -837,6 +1627,39 @@ class MainWindow(QMainWindow):
         content_layout = QVBoxLayout(content_widget)
         content_layout.setContentsMargins(10, 10, 10, 10)
 
+        tab_layout = QHBoxLayout()
+        tab_layout.setSpacing(5)
+        self.workspace_tabs = QTabBar()
+        self.workspace_tabs.setTabsClosable(True)
+        self.workspace_tabs.setExpanding(False)
+        self.workspace_tabs.setDrawBase(False)
+        self.workspace_tabs.setStyleSheet("""
+            QTabBar::tab {
+                background: #3a3a3a;
+                color: #989898;
+                padding: 4px 12px;
+                border-top-left-radius: 5px;
+                border-top-right-radius: 5px;
+                margin-right: 2px;
+            }
+            QTabBar::tab:selected {
+                background: #505050;
+                color: #ddd;
+            }
+        """)
+        self.workspace_tabs.addTab("Workspace 1")
+        self.workspace_tabs.currentChanged.connect(self.on_workspace_changed)
+        self.workspace_tabs.tabCloseRequested.connect(self.close_workspace)
+        self.workspace_tabs.tabBarDoubleClicked.connect(self.rename_workspace)
+        tab_layout.addWidget(self.workspace_tabs)
+        self.add_workspace_button = QPushButton("+")
+        self.add_workspace_button.setFixedSize(22, 22)
+        self.add_workspace_button.setStyleSheet("background-color: #3a3a3a; border-radius: 5px; color: #ddd; border: none;")
+        self.add_workspace_button.clicked.connect(self.add_workspace)
+        tab_layout.addWidget(self.add_workspace_button)
+        tab_layout.addStretch()
+        content_layout.addLayout(tab_layout)
+
         self.vertical_splitter = CustomSplitter(Qt.Vertical)
         self.vertical_splitter.setHandleWidth(15)
         self.top_splitter = CustomSplitter(Qt.Horizontal)
@@ -856,9 +1679,7 @@ class MainWindow(QMainWindow):
         scroll2.setWidgetResizable(True)
         self.top_splitter.addWidget(scroll2)
 
-        self.part1_container.text_edit.textChanged.connect(
-            lambda: self.part2_container.text_edit.setText(self.part1_container.text_edit.toPlainText())
-        )
+        self.part1_container.text_edit.textChanged.connect(self.sync_part2_text)
         self.vertical_splitter.addWidget(self.top_splitter)
 
         self.part3_container = Part3Container()
@@ -869,6 +1690,13 @@ class MainWindow(QMainWindow):
         scroll3.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         self.vertical_splitter.addWidget(scroll3)
 
+        self.preview_pane = PreviewPane(self.part2_container)
+        self.vertical_splitter.addWidget(self.preview_pane)
+        self.part3_container.snippets_changed.connect(self.preview_pane.on_snippets_changed)
+        QApplication.instance().focusChanged.connect(self.on_focus_changed)
+        self.part2_container.marks_changed.connect(
+            lambda: self.part3_container.set_slot_count(len(self.part2_container.marked_spots)))
+
         content_layout.addWidget(self.vertical_splitter)
         separator = QFrame()
         separator.setFrameShape(QFrame.HLine)
@@ -916,17 +1744,19 @@ class MainWindow(QMainWindow):
 
         self.setCentralWidget(self.central_widget)
     
+    def on_focus_changed(self, old, new):
+        field = new.parent() if new is not None else None
+        if isinstance(field, TextFieldWithHeader):
+            self.preview_pane.set_field(field)
+
+    def sync_part2_text(self):
+        self.part2_container.text_edit.setPlainText(self.part1_container.text_edit.toPlainText())
+        self.part2_container.text_edit.refresh_highlights()
+
     def initialize_session_files(self):
-        log_filename = "session.log"
-        with open(log_filename, "w") as f:
+        with open(session().log_path, "w") as f:
             f.write("")
-
-        save_folder = "saves"
-        if not os.path.exists(save_folder):
-            os.makedirs(save_folder)
-        json_path = os.path.join(save_folder, "session.json")
-        with open(json_path, "w") as f:
-            json.dump({"Marks": []}, f, indent=4)
+        write_json_atomic(session().json_path, {"Marks": []})
 
     def showEvent(self, event):
         super().showEvent(event)
@@ -942,26 +1772,206 @@ class MainWindow(QMainWindow):
             self.style_timer.stop()
         if hasattr(self, 'layout_reset_timer') and self.layout_reset_timer.isActive():
             self.layout_reset_timer.stop()
+        if self.file_watcher is not None:
+            self.file_watcher.stop()
+        if self.history is not None:
+            self.history.close()
+        stores = [getattr(self, 'finished_outputs', None)] + [workspace.finished_outputs for workspace in self.workspaces]
+        for outputs in stores:
+            if isinstance(outputs, PagedOutputStore):
+                outputs.close()
+        session().close()
         event.accept()
 
     def reset_layout(self):
         if not hasattr(self, 'vertical_splitter'):
             return
         total_v = sum(self.vertical_splitter.sizes())
-        self.vertical_splitter.setSizes([total_v // 2, total_v - total_v // 2])
+        self.vertical_splitter.setSizes([total_v // 2, total_v * 3 // 8, total_v - total_v // 2 - total_v * 3 // 8])
     
         total_h = sum(self.top_splitter.sizes())
         if total_h == 0:
             total_h = 1000
         self.top_splitter.setSizes([total_h // 3, total_h - total_h // 3])
 
+    def add_workspace(self):
+        number = len(self.workspaces) + 1
+        self.workspaces.append(Workspace(f"Workspace {number}"))
+        self.workspace_tabs.addTab(f"Workspace {number}")
+        self.workspace_tabs.setCurrentIndex(len(self.workspaces) - 1)
+
+    def close_workspace(self, index):
+        if len(self.workspaces) == 1:
+            return
+        workspace = self.workspaces.pop(index)
+        outputs = workspace.finished_outputs
+        if workspace is self.active_workspace:
+            outputs = getattr(self, 'finished_outputs', [])
+            self.active_workspace = None
+        # Emitted before the tab goes, so a recorder sees the close ahead of the tab switch it causes.
+        self.workspace_closed.emit(index)
+        self.workspace_tabs.removeTab(index)
+        # The tab switch has loaded another workspace by now; its outputs are only closed if nobody shares them.
+        if isinstance(outputs, PagedOutputStore) and outputs is not getattr(self, 'finished_outputs', None) and not any(
+                other.finished_outputs is outputs for other in self.workspaces):
+            if self.output_window is not None and self.output_window.model.outputs is outputs:
+                self.output_window.set_outputs([])
+            outputs.close()
+        log_write("Workspace: Closed " + workspace.name)
+
+    def rename_workspace(self, index):
+        if index < 0:
+            return
+        workspace = self.workspaces[index]
+        name, ok = QInputDialog.getText(self, "Rename Workspace", "Name:", text=workspace.name)
+        if ok and name.strip():
+            workspace.name = name.strip()
+            self.workspace_tabs.setTabText(index, workspace.name)
+
+    def on_workspace_changed(self, index):
+        if index < 0 or self.workspaces[index] is self.active_workspace:
+            return
+        if self.active_workspace is not None:
+            self.store_workspace(self.active_workspace)
+        self.active_workspace = self.workspaces[index]
+        self.load_workspace(self.active_workspace)
+
+    def store_workspace(self, workspace):
+        self.commit_field_edits()
+        workspace.part1_text = self.part1_container.text_edit.toPlainText()
+        workspace.marks = self.part2_container.marked_spots
+        workspace.transforms = self.part2_container.transforms_field.text()
+        workspace.fields = [(field.header.text(), field.text_edit.toPlainText()) for field in self.part3_container.fields]
+        workspace.eval_finished = self.eval_finished
+        workspace.finished_outputs = getattr(self, 'finished_outputs', [])
+        workspace.output_index = getattr(self, 'output_index', None)
+        workspace.token_counts = getattr(self, 'token_counts', None)
+        workspace.fingerprint = self.fingerprint
+        workspace.output_changes = self.output_changes
+
+    def load_workspace(self, workspace):
+        self.loading = True
+        if self.part2_container.overlay_field is not None:
+            self.part2_container.on_clear_clicked()
+        self.part2_container.marked_spots = workspace.marks
+        self.part1_container.text_edit.setPlainText(workspace.part1_text)
+        self.part2_container.update_marked_counter()
+        self.part2_container.transforms_field.setText(workspace.transforms)
+
+        self.settings_menu.output_spin_box.blockSignals(True)
+        self.settings_menu.output_spin_box.setValue(len(workspace.fields))
+        self.settings_menu.output_spin_box.blockSignals(False)
+        self.part3_container.update_field_count(len(workspace.fields))
+        for field, (header, content) in zip(self.part3_container.fields, workspace.fields):
+            field.header.setText(header)
+            field.text_edit.setPlainText(content)
+        self.fields_state = PersistentVector.from_list(workspace.fields)
+        self.edited_fields.clear()
+        self.undo_timer.stop()
+
+        self.eval_finished = workspace.eval_finished
+        self.finished_outputs = workspace.finished_outputs
+        self.output_index = workspace.output_index
+        self.token_counts = workspace.token_counts
+        self.fingerprint = workspace.fingerprint
+        self.output_changes = workspace.output_changes
+        self.status_icon.setStatus("check" if self.eval_finished else "dots")
+        self.loading = False
+        log_write("Workspace: Switched to " + workspace.name)
+
     def update_part3_fields(self, count):
+        if not self.loading:
+            self.commit_field_edits()
+            fields_state = self.fields_state.resize(count, ("Header", ""))
+            self.push_undo(("fields", self.fields_state, fields_state))
+            self.fields_state = fields_state
         self.part3_container.update_field_count(count)
-        self.update_text_field_styles_dynamic()
+
+    def current_fields(self):
+        return [(field.header.text(), field.text_edit.toPlainText()) for field in self.part3_container.fields]
+
+    def watch_field_edits(self, field):
+        field.text_edit.textChanged.connect(lambda: self.on_field_edited(field))
+        field.header.textChanged.connect(lambda: self.on_field_edited(field))
+        # Field edits are on the window's undo stack; the editors' own undo would revert them behind its back.
+        field.text_edit.setUndoRedoEnabled(False)
+        field.text_edit.installEventFilter(self)
+        field.header.installEventFilter(self)
+
+    def on_field_edited(self, field):
+        if self.loading:
+            return
+        # Typing is folded into one undo step per pause instead of one per keystroke.
+        self.edited_fields.add(field)
+        self.undo_timer.start(1000)
+
+    def commit_field_edits(self):
+        self.undo_timer.stop()
+        if not self.edited_fields:
+            return
+        fields = self.part3_container.fields
+        fields_state = self.fields_state
+        for field in self.edited_fields:
+            if field in fields:
+                fields_state = fields_state.set(fields.index(field), (field.header.text(), field.text_edit.toPlainText()))
+        self.edited_fields.clear()
+        if fields_state is not self.fields_state:
+            self.active_workspace.undo.push(("fields", self.fields_state, fields_state))
+            self.fields_state = fields_state
+
+    def push_undo(self, entry):
+        if self.loading:
+            return
+        self.commit_field_edits()
+        self.active_workspace.undo.push(entry)
+
+    def undo(self):
+        self.commit_field_edits()
+        entry = self.active_workspace.undo.undo()
+        if entry is not None:
+            kind, before, after = entry
+            self.apply_undo_entry(kind, after, before)
+            log_write("Undo: Reverted " + kind.replace("_", " "))
+
+    def redo(self):
+        # Pending typing becomes its own step first, which also drops the redo branch it replaces.
+        self.commit_field_edits()
+        entry = self.active_workspace.undo.redo()
+        if entry is not None:
+            kind, before, after = entry
+            self.apply_undo_entry(kind, before, after)
+            log_write("Redo: Reapplied " + kind.replace("_", " "))
+
+    def apply_undo_entry(self, kind, current, target):
+        self.loading = True
+        part2 = self.part2_container
+        if kind == "fields":
+            self.settings_menu.output_spin_box.blockSignals(True)
+            self.settings_menu.output_spin_box.setValue(len(target))
+            self.settings_menu.output_spin_box.blockSignals(False)
+            if len(target) != len(self.part3_container.fields):
+                self.update_part3_fields(len(target))
+            changed = list(current.changed_indices(target)) + list(range(len(current), len(target)))
+            for index in changed:
+                header, content = target[index]
+                field = self.part3_container.fields[index]
+                if field.header.text() != header:
+                    field.header.setText(header)
+                if field.text_edit.toPlainText() != content:
+                    field.text_edit.setPlainText(content)
+            self.fields_state = target
+        elif kind == "marks":
+            part2.marked_spots.discard(current)
+            part2.marked_spots.extend(target)
+        else:
+            part2.marked_spots = target
+        part2.text_edit.refresh_highlights()
+        part2.update_marked_counter()
+        self.loading = False
 
     def open_log(self):
-        if os.path.exists("session.log"):
-            QDesktopServices.openUrl(QUrl.fromLocalFile("session.log"))
+        if os.path.exists(session().log_path):
+            QDesktopServices.openUrl(QUrl.fromLocalFile(session().log_path))
         else:
             print("Log file not found.")
 
@@ -970,9 +1980,17 @@ class MainWindow(QMainWindow):
             log_write("Run: Input needs to be evaluated first.")
             self.status_icon.setStatus("X")
             return
+        elif self.part2_container.transforms_error is not None:
+            log_write("Run: Invalid transforms: " + self.part2_container.transforms_error)
+            self.status_icon.setStatus("X")
+            return
         else:
             self.status_icon.setStatus("reload")
             log_write("Run: Running Program...")
+            self.part3_container.lint_dirty_fields()
+            for index, field in enumerate(self.part3_container.fields, start=1):
+                for issue in field.issues:
+                    log_write(f"Run: Field {index} ({field.header.text()}): {issue}.")
             self.run_start_time = time.time()
             self.run_errors = []
             try:
@@ -983,44 +2001,193 @@ class MainWindow(QMainWindow):
                 self.check_run_method()
     
     def run_program_logic(self):
-        import re
-        replacement_array = [spot["text"] for spot in self.part2_container.marked_spots]
+        replacement_array = self.part2_container.keywords()
+        fields = [(field.header.text(), field.text_edit.toPlainText()) for field in self.part3_container.fields]
+        templates = self.part3_container.expanded_fields()
+        # The Run streams into the paged store: per output only a token count, a change state and a digest stay
+        # in memory, and the search index is fed while outputs stream in, up to SEARCH_INDEX_LIMIT.
+        outputs = self.new_output_store()
+        output_index = OutputIndex()
+        # Counts are summed from per-keyword and per-segment counts, so a big batch tokenizes each piece once.
+        token_counts = array("H")
+        prompt_filter = self.settings_menu.prompt_filter()
+        if self.fingerprint is None:
+            self.fingerprint = self.read_fingerprint(templates)
+        changes = ChangeTracker(self.fingerprint)
+        rendered = iter_render_fields(templates, replacement_array)
+        shadow = self.settings_menu.shadow_check(fields, self.part2_container.transforms)
+        if shadow is not None:
+            rendered = shadow.observe_stream(list(self.part2_container.marked_spots.texts), rendered)
+        if tokens_available():
+            rendered = zip(rendered, iter_token_counts(templates, replacement_array))
+        else:
+            token_counts = None
+            log_write(f"Run: CLIP vocabulary {VOCAB_FILE} not found, token counts would only be a lower bound, "
+                      f"so counts and the {TOKEN_LIMIT} token warning are off.")
+            rendered = zip(rendered, repeat(None))
+        try:
+            with self.open_sinks() as pipeline:
+                for (header, text), token_count in rendered:
+                    if prompt_filter is not None and not prompt_filter.keep(text):
+                        continue
+                    outputs.append(header, text)
+                    if output_index is not None:
+                        output_index.add(header, text)
+                        if output_index.count > SEARCH_INDEX_LIMIT:
+                            output_index = None
+                    if token_counts is not None:
+                        token_counts.append(min(token_count, MAX_TOKEN_COUNT))
+                    changes.add(header, text)
+                    pipeline.write(header, text)
+        except Exception:
+            outputs.close()
+            raise
+        if shadow is not None:
+            self.start_shadow_check(shadow)
+        if prompt_filter is not None:
+            log_write(f"Run: {prompt_filter.summary()}.")
+        changes.finish()
+        self.fingerprint = changes.fingerprint()
+        self.output_changes = changes
+        log_write(f"Run: Compared to the previous run, {changes.summary()}.")
+
+        self.set_finished_outputs(outputs)
+        self.output_index = output_index
+        self.token_counts = token_counts
+        over_limit = sum(1 for count in token_counts if count > TOKEN_LIMIT) if token_counts is not None else 0
+        if over_limit:
+            log_write(f"Run: {over_limit} output(s) exceed {TOKEN_LIMIT} CLIP tokens and will be truncated.")
+        try:
+            self.run_history().record_run(fields, list(self.part2_container.marked_spots.texts), outputs,
+                                          self.run_start_time, time.time() - self.run_start_time)
+            self.run_history().write_fingerprint(self.active_workspace.name, templates, self.fingerprint)
+        except sqlite3.Error as e:
+            log_write("Run: Could not save run to history: " + str(e))
+        self.display_output_window(outputs, output_index, self.token_counts, changes)
+
+    def new_output_store(self):
+        # Stores live in the session folder, so whatever a crashed instance leaves behind goes with its session.
+        self.output_store_count += 1
+        return PagedOutputStore(os.path.join(session().path, "outputs", str(self.output_store_count)))
+
+    def set_finished_outputs(self, outputs):
+        old = getattr(self, 'finished_outputs', None)
+        self.finished_outputs = outputs
+        if isinstance(old, PagedOutputStore) and old is not outputs and not any(
+                workspace.finished_outputs is old for workspace in self.workspaces if workspace is not self.active_workspace):
+            old.close()
+
+    def read_fingerprint(self, fields):
+        # Loaded on a workspace's first Run, so the last Run before a restart still counts as the previous one.
+        try:
+            return self.run_history().read_fingerprint(self.active_workspace.name, fields)
+        except sqlite3.Error as e:
+            log_write("Run: Could not read the previous run's fingerprint: " + str(e))
+            return {}
+
+    def run_history(self):
+        if self.history is None:
+            self.history = RunHistory(os.path.join(data_dir(), "saves", "history.sqlite"))
+        return self.history
+
+    def run_table(self):
+        save_folder = os.path.join(data_dir(), "saves")
+        filename, _ = QFileDialog.getOpenFileName(self, "Run Table", save_folder,
+                                                  "Table Files (*.csv *.tsv *.txt);;All Files (*)")
+        if not filename:
+            return
+        if self.part2_container.transforms_error is not None:
+            log_write("Table: Invalid transforms: " + self.part2_container.transforms_error)
+            self.status_icon.setStatus("X")
+            return
+        kinds = self.settings_menu.selected_sinks() or ["jsonl"]
+        name = os.path.splitext(os.path.basename(filename))[0]
+        fields = self.part3_container.expanded_fields()
+        start_time = time.time()
+        count = 0
+        prompt_filter = self.settings_menu.prompt_filter()
+        shadow = self.settings_menu.shadow_check(self.current_fields(), self.part2_container.transforms)
+        store = self.new_output_store()
+        try:
+            with create_sinks(self.sink_dir, kinds, name=name) as pipeline:
+                rows = read_table(filename, self.settings_menu.table_header_checkbox.isChecked())
+                outputs = TableRenderer(fields, self.part2_container.transforms, shadow).iter_render(rows)
+                if prompt_filter is not None:
+                    outputs = prompt_filter.filter(outputs)
+                for header, text in outputs:
+                    pipeline.write(header, text)
+                    store.append(header, text)
+                    count += 1
+        except (OSError, ValueError, UnicodeDecodeError) as e:
+            store.close()
+            self.status_icon.setStatus("X")
+            log_write("Table: Failed to render " + filename + ": " + str(e))
+            return
+        self.status_icon.setStatus("check")
+        log_write(f"Table: Rendered {count} output(s) from {filename} as {', '.join(kinds)} "
+                  f"to {self.sink_dir} in {time.time() - start_time:.2f} seconds.")
+        if prompt_filter is not None:
+            log_write(f"Table: {prompt_filter.summary()}.")
+        if shadow is not None:
+            self.start_shadow_check(shadow)
+        # Table outputs are only browsed: they are not counted up front, indexed or compared to a previous run.
+        self.set_finished_outputs(store)
+        self.output_index = None
+        self.token_counts = None
+        self.output_changes = None
+        self.display_output_window(store)
+
+    def start_shadow_check(self, shadow):
+        # Samples are compared a slice per timer tick, so the window stays responsive while they are checked.
+        self.shadow_checks.append(shadow)
+        self.shadow_timer.start()
+
+    def check_shadow_samples(self):
+        if not self.shadow_checks:
+            return
+        shadow = self.shadow_checks[0]
+        if shadow.check():
+            self.shadow_checks.pop(0)
+            for mismatch in shadow.reports:
+                log_write("Shadow: Mismatch " + json.dumps(mismatch))
+            log_write(f"Shadow: {shadow.summary()}.")
+            if shadow.mismatches:
+                self.status_icon.setStatus("X")
+        if self.shadow_checks:
+            self.shadow_timer.start()
+
+    def export_changed_outputs(self):
+        kinds = self.settings_menu.selected_sinks() or ["jsonl"]
+        count = 0
+        try:
+            with create_sinks(self.sink_dir, kinds, name="changed") as pipeline:
+                for header, text in self.output_window.changed_outputs():
+                    pipeline.write(header, text)
+                    count += 1
+        except OSError as e:
+            log_write("Output: Could not export changed outputs: " + str(e))
+            return
+        log_write(f"Output: Exported {count} new or changed output(s) as {', '.join(kinds)} to {self.sink_dir}")
 
-        outputs = []
-        for field in self.part3_container.fields:
-            original_text = field.text_edit.toPlainText().strip()
-            if original_text == "":
-                continue
-
-            header = field.header.text()
-            pattern = r"[a-z](\d+)"
-            def replace_match(match):
-                num = int(match.group(1))
-                if 1 <= num <= len(replacement_array):
-                    return replacement_array[num - 1]
-                else:
-                    return match.group(0)
-            replaced_text = re.sub(pattern, replace_match, original_text)
-            outputs.append((header, replaced_text))
+    def open_sinks(self):
+        kinds = self.settings_menu.selected_sinks()
+        if not kinds:
+            return SinkPipeline()
+        log_write(f"Run: Writing outputs as {', '.join(kinds)} to {self.sink_dir}")
+        return create_sinks(self.sink_dir, kinds)
 
-        self.finished_outputs = outputs
-        self.display_output_window(outputs)
+    def choose_sink_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Output Folder", self.sink_dir)
+        if folder:
+            self.sink_dir = folder
+            log_write("Outputs will be written to " + folder)
 
     def check_run_method(self):
         run_duration = time.time() - self.run_start_time if hasattr(self, 'run_start_time') else 0
 
-        written_fields_count = 0
-        empty_fields = []
-        for index, field in enumerate(self.part3_container.fields, start=1):
-            text = field.text_edit.toPlainText().strip()
-            if text == "":
-                empty_fields.append(index)
-            else:
-                written_fields_count += 1
-
+        written_fields_count = sum(
+            1 for field in self.part3_container.fields if field.snippet is None and field.template().segments)
         log_write(f"Run: {written_fields_count} text field(s) contain text.")
-        if empty_fields:
-            log_write(f"Run: {len(empty_fields)} empty text field(s) detected at field numbers: {', '.join(map(str, empty_fields))}.")
 
         errors = getattr(self, 'run_errors', [])
         if errors:
@@ -1033,25 +2200,33 @@ class MainWindow(QMainWindow):
             self.status_icon.setStatus("check")
             log_write(f"Run: Successfully finished in {run_duration:.2f} seconds.")
 
-    def display_output_window(self, outputs):
-        self.output_overlay = OutputOverlay(self.central_widget)
+    def display_output_window(self, outputs, output_index=None, token_counts=None, changes=None):
+        # One overlay and window live for the whole session; each run only swaps the model's outputs.
+        if self.output_overlay is None:
+            self.output_overlay = OutputOverlay(self.central_widget)
+            self.output_window = OutputWindow(outputs, output_index, token_counts, changes, self.output_overlay)
+            self.output_window.back_button.clicked.connect(self.close_output_window)
+            self.output_window.export_changed_button.clicked.connect(self.export_changed_outputs)
+        else:
+            self.output_window.set_outputs(outputs, output_index, token_counts, changes)
+        self.output_overlay.setGeometry(self.central_widget.rect())
         self.output_overlay.show()
         self.output_overlay.raise_()
 
-        self.output_window = OutputWindow(outputs, self.output_overlay)
-        self.output_window.back_button.clicked.connect(self.close_output_window)
+        self.center_popup(self.output_window)
+        self.output_window.show()
+        self.output_window.raise_()
 
+    def center_popup(self, popup):
         mw = self.size()
         max_width = int(mw.width() * 0.9)
         max_height = int(mw.height() * 0.9)
-        win_size = self.output_window.sizeHint()
+        win_size = popup.sizeHint()
         output_width = min(win_size.width(), max_width)
         output_height = min(win_size.height(), max_height)
         x = (mw.width() - output_width) // 2
         y = (mw.height() - output_height) // 2
-        self.output_window.setGeometry(x, y, output_width, output_height)
-        self.output_window.show()
-        self.output_window.raise_()
+        popup.setGeometry(x, y, output_width, output_height)
 
     def show_settings_menu(self):
         if not hasattr(self, 'overlay') or self.overlay is None:
@@ -1077,64 +2252,139 @@ class MainWindow(QMainWindow):
 
     def show_output_window(self):
         outputs = self.finished_outputs if hasattr(self, 'finished_outputs') and self.finished_outputs else []
-
-        self.output_overlay = OutputOverlay(self.central_widget)
-        self.output_overlay.show()
-        self.output_overlay.raise_()
-
-        self.output_window = OutputWindow(outputs, self.output_overlay)
-        self.output_window.back_button.clicked.connect(self.close_output_window)
-
-        mw = self.size()
-        max_width = int(mw.width() * 0.9)
-        max_height = int(mw.height() * 0.9)
-        win_size = self.output_window.sizeHint()
-        output_width = min(win_size.width(), max_width)
-        output_height = min(win_size.height(), max_height)
-        x = (mw.width() - output_width) // 2
-        y = (mw.height() - output_height) // 2
-        self.output_window.setGeometry(x, y, output_width, output_height)
-        self.output_window.show()
-        self.output_window.raise_()
+        output_index = self.output_index if outputs else None
+        token_counts = self.token_counts if outputs else None
+        changes = self.output_changes if outputs else None
+        self.display_output_window(outputs, output_index, token_counts, changes)
 
     def close_output_window(self):
-        if hasattr(self, 'output_window'):
-            self.output_window.close()
-            self.output_window = None
-        if hasattr(self, 'output_overlay'):
-            self.output_overlay.close()
-            self.output_overlay = None
+        if self.output_overlay is not None:
+            self.output_overlay.hide()
+            self.output_window.view.copied_timer.stop()
+            self.output_window.view.hide_copied_indicator()
+
+    def show_history_window(self):
+        self.settings_menu.hide_with_fade()
+        if getattr(self, 'overlay', None) is not None:
+            self.overlay.hide()
+        # Like the output window, the history window is built once and only reloads its runs when shown again.
+        try:
+            history = self.run_history()
+            if self.history_overlay is None:
+                self.history_overlay = OutputOverlay(self.central_widget)
+                self.history_window = HistoryWindow(history, self.history_overlay)
+                self.history_window.back_button.clicked.connect(self.close_history_window)
+                self.history_window.run_opened.connect(self.open_history_run)
+            else:
+                self.history_window.history = history
+                self.history_window.search_field.blockSignals(True)
+                self.history_window.search_field.clear()
+                self.history_window.search_field.blockSignals(False)
+                self.history_window.load_runs("")
+        except sqlite3.Error as e:
+            log_write("History: Could not open run history: " + str(e))
+            return
+        self.history_overlay.setGeometry(self.central_widget.rect())
+        self.history_overlay.show()
+        self.history_overlay.raise_()
+
+        self.center_popup(self.history_window)
+        self.history_window.show()
+        self.history_window.raise_()
+
+    def close_history_window(self):
+        if self.history_overlay is not None:
+            self.history_overlay.hide()
+            self.history_window.run_list.clear()
+
+    def open_history_run(self, run_id):
+        outputs = self.run_history().run_outputs(run_id)
+        self.close_history_window()
+        log_write(f"History: Opened {len(outputs)} output(s) of run #{run_id}")
+        self.display_output_window(outputs)
 
     def import_layout(self):
-        save_folder = os.path.join(os.getcwd(), "saves")
+        save_folder = os.path.join(data_dir(), "saves")
         filename, _ = QFileDialog.getOpenFileName(self, "Import Layout", save_folder, "JSON Files (*.json)")
         if filename:
-            with open(filename, "r") as f:
-                layout_data = json.load(f)
-            self.part3_container.update_field_count(len(layout_data))
-            for field, data in zip(self.part3_container.fields, layout_data):
-                field.header.setText(data.get("header", ""))
-                field.text_edit.setPlainText(data.get("content", ""))
+            self.apply_layout(read_layout(filename))
             log_write("Imported layout from " + filename)
+
+    def apply_layout(self, layout_fields):
+        fields_state = PersistentVector.from_list(layout_fields)
+        self.push_undo(("fields", self.fields_state, fields_state))
+        self.loading = True
+        self.settings_menu.output_spin_box.blockSignals(True)
+        self.settings_menu.output_spin_box.setValue(len(layout_fields))
+        self.settings_menu.output_spin_box.blockSignals(False)
+        self.part3_container.update_field_count(len(layout_fields))
+        for field, (header, content) in zip(self.part3_container.fields, layout_fields):
+            field.header.setText(header)
+            field.text_edit.setPlainText(content)
+        self.fields_state = fields_state
+        self.loading = False
+        self.layout_applied.emit(layout_fields)
     
     def export_layout(self):
-        save_folder = os.path.join(os.getcwd(), "saves")
+        save_folder = os.path.join(data_dir(), "saves")
         if not os.path.exists(save_folder):
             os.makedirs(save_folder)
     
         filename, _ = QFileDialog.getSaveFileName(self, "Export Layout", save_folder, "JSON Files (*.json)")
         if filename:
-            layout_data = []
-            for field in self.part3_container.fields:
-                layout_data.append({
-                    "header": field.header.text(),
-                    "content": field.text_edit.toPlainText()
-                })
-            with open(filename, "w") as f:
-                json.dump(layout_data, f, indent=4)
+            fields = [(field.header.text(), field.text_edit.toPlainText()) for field in self.part3_container.fields]
+            write_layout(filename, fields)
             log_write("Exported layout to " + filename)
 
+    def toggle_watch(self):
+        if self.file_watcher is not None:
+            self.file_watcher.stop()
+            self.file_watcher.deleteLater()
+            self.file_watcher = None
+            self.settings_menu.watch_button.setText("Watch Files")
+            log_write("Watch: Stopped watching files.")
+            return
+
+        save_folder = os.path.join(data_dir(), "saves")
+        layout_path, _ = QFileDialog.getOpenFileName(self, "Watch Layout", save_folder, "JSON Files (*.json)")
+        if not layout_path:
+            return
+        keywords_path, _ = QFileDialog.getOpenFileName(self, "Watch Keywords", save_folder,
+                                                       "Keyword Files (*.txt *.json);;All Files (*)")
+        if not keywords_path:
+            return
+        output_dir = QFileDialog.getExistingDirectory(self, "Watch Output Folder", save_folder)
+        if not output_dir:
+            return
+
+        watch_session = WatchSession(layout_path, keywords_path, output_dir, self.part2_container.transforms)
+        self.file_watcher = FileWatcher(watch_session, parent=self)
+        self.file_watcher.refreshed.connect(self.on_watch_refreshed)
+        self.file_watcher.failed.connect(self.on_watch_failed)
+        self.settings_menu.watch_button.setText("Stop Watching")
+        log_write(f"Watch: Watching {layout_path} and {keywords_path}, writing to {output_dir}")
+        self.file_watcher.refresh()
+
+    def on_watch_refreshed(self, rendered):
+        self.status_icon.setStatus("check")
+        log_write(f"Watch: Re-rendered {len(rendered)} output(s).")
+
+    def on_watch_failed(self, message):
+        self.status_icon.setStatus("X")
+        log_write("Watch: Could not refresh outputs: " + message)
+
     def eventFilter(self, obj, event):
+        if obj is not self:
+            # Undo keys pressed in a Part3 field go to the window's stack.
+            if event.type() == QEvent.KeyPress:
+                keys = QKeySequence(int(event.modifiers()) | event.key())
+                if keys == QKeySequence("Ctrl+Z"):
+                    self.undo()
+                    return True
+                if keys == QKeySequence("Ctrl+Y") or keys == QKeySequence("Ctrl+Shift+Z"):
+                    self.redo()
+                    return True
+            return super().eventFilter(obj, event)
         if event.type() == QEvent.MouseButtonPress and self.settings_menu.isVisible():
             geo = QRect(self.settings_menu.mapToGlobal(self.settings_menu.rect().topLeft()),
                         self.settings_menu.size())
@@ -1145,20 +2395,31 @@ class MainWindow(QMainWindow):
 
     def resizeEvent(self, event):
         super().resizeEvent(event)
-        rect_f = QRectF(self.rect())
-        path = QPainterPath()
-        path.addRoundedRect(rect_f, 8.0, 8.0)
-        region = QRegion(path.toFillPolygon().toPolygon())
+        schedule_layout_pass(self.apply_window_mask)
+        schedule_layout_pass(self.relayout_popups)
+
+    def apply_window_mask(self):
+        size = (self.width(), self.height())
+        region = self.mask_cache.get(size)
+        if region is None:
+            rect_f = QRectF(self.rect())
+            path = QPainterPath()
+            path.addRoundedRect(rect_f, 8.0, 8.0)
+            region = QRegion(path.toFillPolygon().toPolygon())
+            self.mask_cache[size] = region
+            if len(self.mask_cache) > 32:
+                self.mask_cache.popitem(last=False)
+        else:
+            self.mask_cache.move_to_end(size)
         self.setMask(region)
 
-        if hasattr(self, 'output_overlay') and self.output_overlay:
+    def relayout_popups(self):
+        if self.output_overlay is not None and self.output_overlay.isVisible():
             self.output_overlay.setGeometry(self.central_widget.rect())
-            if hasattr(self, 'output_window') and self.output_window:
-                overlay_rect = self.output_overlay.rect()
-                win_size = self.output_window.sizeHint()
-                x = (overlay_rect.width() - win_size.width()) // 2
-                y = (overlay_rect.height() - win_size.height()) // 2
-                self.output_window.setGeometry(x, y, win_size.width(), win_size.height())
+            self.center_popup(self.output_window)
+        if self.history_overlay is not None and self.history_overlay.isVisible():
+            self.history_overlay.setGeometry(self.central_widget.rect())
+            self.center_popup(self.history_window)
 
     def paintEvent(self, event):
         p = QPainter(self)
@@ -1182,7 +2443,7 @@ class MainWindow(QMainWindow):
         bg_hex = '#%02x%02x%02x' % new_bg
         border_hex = '#%02x%02x%02x' % new_border
         style = f"""
-            QTextEdit {{
+            QPlainTextEdit {{
                 background-color: {bg_hex};
                 border: 1px solid {border_hex};
                 border-radius: 8px;
@@ -1191,11 +2452,11 @@ class MainWindow(QMainWindow):
             }}
         """
         self.part1_container.text_edit.setStyleSheet(style)
-        for field in self.part3_container.fields:
-            field.text_edit.setStyleSheet(style)
+        self.preview_pane.text_edit.setStyleSheet(style)
+        self.part3_container.set_field_style(style)
 
         style_p2 = f"""
-            QTextEdit {{
+            QPlainTextEdit {{
                 background: transparent;
                 border: none;
                 color: {text_hex};
@@ -0,0 +1,92 @@
+CHUNK_SIZE = 32
+UNDO_LIMIT = 500
+
+
+class PersistentVector:
+    # Immutable list split into chunks; set() copies one chunk and shares all the others with the old version.
+    __slots__ = ("chunks", "length")
+
+    def __init__(self, chunks=(), length=0):
+        self.chunks = chunks
+        self.length = length
+
+    @classmethod
+    def from_list(cls, items):
+        items = tuple(items)
+        return cls(tuple(items[i:i + CHUNK_SIZE] for i in range(0, len(items), CHUNK_SIZE)), len(items))
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if not 0 <= index < self.length:
+            raise IndexError(index)
+        return self.chunks[index // CHUNK_SIZE][index % CHUNK_SIZE]
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            yield from chunk
+
+    def set(self, index, value):
+        chunk_index, offset = divmod(index, CHUNK_SIZE)
+        chunk = self.chunks[chunk_index]
+        if chunk[offset] is value:
+            return self
+        chunk = chunk[:offset] + (value,) + chunk[offset + 1:]
+        return PersistentVector(self.chunks[:chunk_index] + (chunk,) + self.chunks[chunk_index + 1:], self.length)
+
+    def resize(self, length, fill):
+        if length <= self.length:
+            full, rest = divmod(length, CHUNK_SIZE)
+            chunks = self.chunks[:full] + ((self.chunks[full][:rest],) if rest else ())
+            return PersistentVector(chunks, length)
+        chunks = list(self.chunks)
+        missing = length - self.length
+        if chunks and len(chunks[-1]) < CHUNK_SIZE:
+            count = min(CHUNK_SIZE - len(chunks[-1]), missing)
+            chunks[-1] += (fill,) * count
+            missing -= count
+        while missing > 0:
+            count = min(CHUNK_SIZE, missing)
+            chunks.append((fill,) * count)
+            missing -= count
+        return PersistentVector(tuple(chunks), length)
+
+    def changed_indices(self, other):
+        # Chunks shared by both versions are skipped without looking at their items.
+        for chunk_index in range(min(len(self.chunks), len(other.chunks))):
+            chunk, other_chunk = self.chunks[chunk_index], other.chunks[chunk_index]
+            if chunk is other_chunk:
+                continue
+            base = chunk_index * CHUNK_SIZE
+            for offset in range(min(len(chunk), len(other_chunk))):
+                if chunk[offset] != other_chunk[offset]:
+                    yield base + offset
+
+
+class UndoStack:
+    # Entries are ("fields", before, after), ("marks", removed, added) or ("replace_marks", before, after).
+    def __init__(self, limit=UNDO_LIMIT):
+        self.limit = limit
+        self.undo_entries = []
+        self.redo_entries = []
+
+    def push(self, entry):
+        self.undo_entries.append(entry)
+        if len(self.undo_entries) > self.limit:
+            del self.undo_entries[0]
+        self.redo_entries = []
+
+    def undo(self):
+        if not self.undo_entries:
+            return None
+        entry = self.undo_entries.pop()
+        self.redo_entries.append(entry)
+        return entry
+
+    def redo(self):
+        if not self.redo_entries:
+            return None
+        entry = self.redo_entries.pop()
+        self.undo_entries.append(entry)
+        return entry
@@ -0,0 +1,97 @@
+import os, time
+from layout import read_layout, read_keywords
+from render import compile_cached, render_template
+from snippets import SnippetGraph
+from transforms import SlotTransforms
+from sinks import output_filename
+from storage import write_atomic
+
+
+class WatchSession:
+    def __init__(self, layout_path, keywords_path, output_dir, transforms=None):
+        self.layout_path = layout_path
+        self.keywords_path = keywords_path
+        self.output_dir = output_dir
+        self.fields = []
+        self.keywords = []
+        self.written = {}
+        self.snippets = SnippetGraph()
+        self.transforms = transforms or SlotTransforms()
+
+    def watched_paths(self):
+        return [self.layout_path, self.keywords_path]
+
+    def changed_slots(self, keywords):
+        old = self.keywords
+        return {
+            num for num in range(1, max(len(old), len(keywords)) + 1)
+            if num > len(old) or num > len(keywords) or old[num - 1] != keywords[num - 1]
+        }
+
+    def refresh(self):
+        # Fields are compared after inlining, so a snippet edit re-renders exactly the templates using it.
+        fields = self.snippets.expand_fields(read_layout(self.layout_path))
+        keywords = self.transforms.apply(read_keywords(self.keywords_path))
+        slots = self.changed_slots(keywords)
+
+        affected = []
+        for index, field in enumerate(fields):
+            if index >= len(self.fields) or self.fields[index] != field:
+                affected.append(index)
+            elif slots and not slots.isdisjoint(compile_cached(field[1]).slots):
+                affected.append(index)
+
+        if not os.path.exists(self.output_dir):
+            os.makedirs(self.output_dir)
+        for index in range(len(fields), len(self.fields)):
+            self.remove_output(index)
+
+        rendered = []
+        for index in affected:
+            header, content = fields[index]
+            if content.strip() == "":
+                self.remove_output(index)
+                continue
+            filename = output_filename(index + 1, header)
+            if self.written.get(index, filename) != filename:
+                self.remove_output(index)
+            write_atomic(os.path.join(self.output_dir, filename),
+                         render_template(compile_cached(content), keywords))
+            self.written[index] = filename
+            rendered.append(header)
+
+        self.fields = fields
+        self.keywords = keywords
+        return rendered
+
+    def remove_output(self, index):
+        filename = self.written.pop(index, None)
+        if filename is not None:
+            path = os.path.join(self.output_dir, filename)
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def poll_watch(session, on_refresh, on_error, interval=0.5, debounce=0.3):
+    signatures = None
+    pending_since = None
+    while True:
+        current = [file_signature(path) for path in session.watched_paths()]
+        if current != signatures:
+            signatures = current
+            pending_since = time.monotonic()
+        elif pending_since is not None and time.monotonic() - pending_since >= debounce:
+            pending_since = None
+            try:
+                on_refresh(session.refresh())
+            except (OSError, ValueError, KeyError) as e:
+                on_error(e)
+        time.sleep(min(interval, debounce))
@@ -0,0 +1,20 @@
+from marks import MarkList
+from undo import UndoStack
+
+
+class Workspace:
+    # Plain data of one tab, only the active workspace is loaded into the editor widgets.
+    def __init__(self, name, field_count=4):
+        self.name = name
+        self.part1_text = ""
+        self.marks = MarkList()
+        self.transforms = ""
+        self.fields = [("Header", "")] * field_count
+        self.eval_finished = False
+        self.finished_outputs = []
+        self.output_index = None
+        self.token_counts = None
+        # Per header digests of the last Run, which the next Run is compared to; None until read from the history.
+        self.fingerprint = None
+        self.output_changes = None
+        self.undo = UndoStack()